@@ -1,14 +1,31 @@
 import logging
-from langgraph.graph import START, StateGraph
-from langgraph.prebuilt import tools_condition, ToolNode
-from .utils import tools
+from langgraph.graph import START, END, StateGraph
+from .utils import get_tools
 from .agent_state import AgentState
-from .nodes import assistant
-
-builder = StateGraph(AgentState)
-builder.add_node("assistant", assistant)
-builder.add_node("tools", ToolNode(tools))
-builder.add_edge(START, "assistant")
-builder.add_conditional_edges("assistant", tools_condition)
-builder.add_edge("tools", "assistant")
-react_graph = builder.compile()
\ No newline at end of file
+from .nodes import assistant, route_after_assistant
+from .compaction import compact_history
+from .tool_executor import ParallelToolNode
+from .checkpointing import get_checkpointer
+from .metrics import timed_node
+from .registry import registry
+
+def build_react_graph():
+    builder = StateGraph(AgentState)
+    builder.add_node("compact", timed_node("compact", compact_history))
+    builder.add_node("assistant", timed_node("assistant", assistant))
+    builder.add_node("tools", timed_node("tools", ParallelToolNode(get_tools())))
+    builder.add_edge(START, "compact")
+    builder.add_edge("compact", "assistant")
+    builder.add_conditional_edges("assistant", route_after_assistant, {"tools": "tools", "assistant": "compact", END: END})
+    builder.add_edge("tools", "compact")
+    return builder.compile(checkpointer=get_checkpointer())
+
+registry.register("react_graph", build_react_graph)
+
+def get_react_graph():
+    return registry.get("react_graph")
+
+def __getattr__(name: str):
+    if name == "react_graph":
+        return get_react_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
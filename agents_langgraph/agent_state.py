@@ -1,8 +1,14 @@
-from typing import TypedDict, List, Annotated, Optional
+from typing import TypedDict, Dict, List, Annotated, Optional
 from langchain_core.messages import AnyMessage
 from langgraph.graph.message import add_messages
 
 class AgentState(TypedDict):
     messages: Annotated[List[AnyMessage], add_messages]
     question: Optional[str]
-    final_answer: Optional[str]
\ No newline at end of file
+    file_path: Optional[str]
+    final_answer: Optional[str]
+    llm_calls: int
+    tool_calls: int
+    model_calls: Dict[str, int]
+    started_at: Optional[float]
+    stop_reason: Optional[str]
\ No newline at end of file
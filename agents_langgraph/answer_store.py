@@ -0,0 +1,91 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional
+
+default_store_path = os.getenv(
+    "AGENT_ANSWER_STORE",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "checkpoints", "answers.jsonl")
+)
+
+def question_hash(question: str) -> str:
+    return hashlib.sha256(question.strip().encode("utf-8")).hexdigest()[:16]
+
+class AnswerStore:
+    """Append-only JSONL store of answers keyed by task_id and question hash.
+
+    Every answer is flushed and fsynced as soon as it is produced, so a restart
+    loses at most the question that was in flight. The last record for a key wins.
+    """
+
+    def __init__(self, path: str = default_store_path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records: Dict[tuple, dict] = {}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            lines = f.readlines()
+        if lines and not lines[-1].endswith("\n"):
+            # Terminate a torn last line so the next append starts on a fresh line.
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n")
+        for line_no, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash mid-write can leave a truncated last line; skip it.
+                logging.warning(f"Skipping corrupt answer store line {line_no} in {self.path}")
+                continue
+            self._records[(record["task_id"], record["question_hash"])] = record
+        logging.info(f"Loaded {len(self._records)} stored answers from {self.path}")
+
+    def get(self, task_id: str, question: str) -> Optional[dict]:
+        with self._lock:
+            return self._records.get((task_id, question_hash(question)))
+
+    def has_answer(self, task_id: str, question: str) -> bool:
+        record = self.get(task_id, question)
+        return record is not None and record["status"] == "ok"
+
+    def put(self, task_id: str, question: str, answer: str, status: str = "ok",
+            latency: Optional[float] = None, metrics: Optional[dict] = None,
+            stop_reason: Optional[str] = None) -> dict:
+        record = {
+            "task_id": task_id,
+            "question_hash": question_hash(question),
+            "question": question,
+            "answer": answer,
+            "status": status,
+            "stop_reason": stop_reason,
+            "latency": latency,
+            "metrics": metrics,
+            "timestamp": time.time(),
+        }
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._records[(task_id, record["question_hash"])] = record
+        return record
+
+    def answered(self) -> List[dict]:
+        """Returns the latest successful answer for every task_id, oldest first."""
+        with self._lock:
+            latest: Dict[str, dict] = {}
+            for record in sorted(self._records.values(), key=lambda r: r["timestamp"]):
+                if record["status"] == "ok":
+                    latest[record["task_id"]] = record
+            return list(latest.values())
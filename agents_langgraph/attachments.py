@@ -0,0 +1,154 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+from . import http_client
+
+default_attachment_dir = os.getenv(
+    "AGENT_ATTACHMENT_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "checkpoints", "attachments")
+)
+
+# Most characters of an attachment handed to the model in one tool result.
+max_attachment_chars = int(os.getenv("AGENT_ATTACHMENT_MAX_CHARS", "20000"))
+TEXT_EXTENSIONS = {".txt", ".md", ".csv", ".tsv", ".json", ".jsonl", ".py", ".xml", ".html", ".htm", ".yaml", ".yml"}
+SPREADSHEET_EXTENSIONS = {".xlsx", ".xls"}
+
+def read_attachment(path: str, root: str = default_attachment_dir, max_chars: int = max_attachment_chars) -> str:
+    """Text of a stored attachment for the model: text and CSV files as they are, spreadsheets sheet by sheet.
+
+    Only files inside the attachment store are read, so the tool cannot be pointed elsewhere on disk.
+    """
+    path = os.path.realpath(path.strip().strip("'\""))
+    if os.path.commonpath([path, os.path.realpath(root)]) != os.path.realpath(root):
+        return f"Cannot read {path}: only attachments stored under {root} can be read."
+    if not os.path.isfile(path):
+        return f"No attachment found at {path}."
+    ext = os.path.splitext(path)[1].lower()
+    if ext in TEXT_EXTENSIONS:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            text = f.read(max_chars + 1)
+    elif ext in SPREADSHEET_EXTENSIONS:
+        try:
+            import pandas as pd
+            sheets = pd.read_excel(path, sheet_name=None)
+        except ImportError as e:
+            return f"Cannot read spreadsheet {os.path.basename(path)}: {e}"
+        text = "\n\n".join(f"Sheet: {name}\n{frame.to_csv(index=False)}" for name, frame in sheets.items())
+    else:
+        return f"Attachments of type {ext or 'unknown'} cannot be read as text."
+    if len(text) > max_chars:
+        text = text[:max_chars] + f"\n[truncated to the first {max_chars} characters]"
+    return text
+
+class AttachmentStore:
+    """Content-addressed local store for task attachments.
+
+    Files live under objects/<sha256[:2]>/<sha256><ext>, and index.json maps each
+    task_id to its object, so identical files are stored once and reruns never
+    download a task's attachment again.
+    """
+
+    def __init__(self, root: str = default_attachment_dir):
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self._index: Dict[str, dict] = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding="utf-8") as f:
+                self._index = json.load(f)
+
+    def _save_index(self) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    def path_for(self, task_id: str) -> Optional[str]:
+        with self._lock:
+            entry = self._index.get(task_id)
+        if entry and os.path.exists(entry["path"]):
+            return entry["path"]
+        return None
+
+    def _object_path(self, sha256: str, file_name: str) -> str:
+        return os.path.join(self.root, "objects", sha256[:2], sha256 + os.path.splitext(file_name)[1].lower())
+
+    def _write_object(self, response, file_name: str) -> str:
+        """Streams a response body to a temp file while hashing it, then moves it to its content path."""
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in response.iter_content(chunk_size=1 << 16):
+                    digest.update(chunk)
+                    f.write(chunk)
+            sha256 = digest.hexdigest()
+            path = self._object_path(sha256, file_name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, path)
+            return sha256
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def fetch(self, api_url: str, task_id: str, file_name: str) -> Optional[str]:
+        """Returns the local path of a task's attachment, downloading it only if it is not stored yet."""
+        path = self.path_for(task_id)
+        if path:
+            logging.debug(f"Attachment for {task_id} already stored at {path}")
+            return path
+        with http_client.get(f"{api_url}/files/{task_id}", stream=True) as response:
+            if response.status_code == 404:
+                logging.warning(f"No attachment found for task {task_id} ({file_name}).")
+                return None
+            response.raise_for_status()
+            sha256 = self._write_object(response, file_name)
+        with self._lock:
+            path = self._object_path(sha256, file_name)
+            self._index[task_id] = {"file_name": file_name, "sha256": sha256, "path": path}
+            self._save_index()
+        logging.info(f"Stored attachment {file_name} for {task_id} at {path}")
+        return path
+
+class AttachmentPrefetcher:
+    """Downloads every task's attachment concurrently as soon as the question list is known."""
+
+    def __init__(self, api_url: str, store: Optional[AttachmentStore] = None, max_workers: int = 8):
+        self.api_url = api_url
+        self.store = store or AttachmentStore()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="attachment")
+        self._futures: Dict[str, Future] = {}
+
+    def start(self, items: Iterable[dict]) -> "AttachmentPrefetcher":
+        for item in items:
+            file_name = item.get("file_name")
+            if file_name and item["task_id"] not in self._futures:
+                self._futures[item["task_id"]] = self._executor.submit(
+                    self.store.fetch, self.api_url, item["task_id"], file_name
+                )
+        logging.info(f"Prefetching {len(self._futures)} attachments into {self.store.root}")
+        return self
+
+    def get(self, task_id: str, timeout: Optional[float] = None) -> Optional[str]:
+        """Waits for a task's attachment and returns its path, or None if it has none or failed."""
+        future = self._futures.get(task_id)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except Exception as e:
+            logging.error(f"Failed to fetch attachment for {task_id}: {e}")
+            return None
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
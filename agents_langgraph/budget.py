@@ -0,0 +1,26 @@
+import os
+from dataclasses import dataclass
+
+@dataclass(frozen=True)
+class StepBudget:
+    """Caps on the work a single question may consume inside one graph run."""
+    max_llm_calls: int = 15
+    max_tool_calls: int = 20
+    max_seconds: float = 300.0
+
+    @classmethod
+    def from_env(cls) -> "StepBudget":
+        return cls(
+            max_llm_calls=int(os.getenv("AGENT_MAX_LLM_CALLS", cls.max_llm_calls)),
+            max_tool_calls=int(os.getenv("AGENT_MAX_TOOL_CALLS", cls.max_tool_calls)),
+            max_seconds=float(os.getenv("AGENT_MAX_SECONDS", cls.max_seconds)),
+        )
+
+    @property
+    def recursion_limit(self) -> int:
+        # Every LLM call is preceded by a compaction step and can be followed by a tools step.
+        return 3 * self.max_llm_calls + 5
+
+def get_budget(config) -> StepBudget:
+    budget = (config or {}).get("configurable", {}).get("budget")
+    return budget if isinstance(budget, StepBudget) else StepBudget.from_env()
@@ -0,0 +1,111 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict
+from langchain_core.runnables import Runnable
+from .serialization import canonical_messages, decode, encode, request_key
+
+# AGENT_CASSETTE_MODE: "off" (default), "record" or "replay".
+# AGENT_CASSETTE_LATENCY: "zero" (default) or "original" to sleep for the recorded latency on replay.
+cassette_mode = os.getenv("AGENT_CASSETTE_MODE", "off").lower()
+cassette_path = os.getenv(
+    "AGENT_CASSETTE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "cassettes", "default.jsonl")
+)
+replay_latency = os.getenv("AGENT_CASSETTE_LATENCY", "zero").lower()
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode when a request was never recorded."""
+
+class Cassette:
+    """Append-only JSONL recording of LLM and tool interactions.
+
+    Each line holds one interaction: its kind, name, request key, encoded
+    response and the latency observed while recording. Replaying serves
+    responses for a key in the order they were recorded, repeating the last one.
+    """
+
+    def __init__(self, path: str, mode: str):
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._entries: Dict[str, deque] = defaultdict(deque)
+        self._last: Dict[str, dict] = {}
+        if mode == "replay":
+            self._load()
+        elif mode == "record":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def _load(self) -> None:
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["key"]].append(entry)
+        logging.info(f"Loaded {sum(len(v) for v in self._entries.values())} cassette entries from {self.path}")
+
+    def _record(self, kind: str, name: str, key: str, response: Any, latency: float) -> None:
+        entry = {"kind": kind, "name": name, "key": key, "latency": round(latency, 4), "response": encode(response)}
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _replay(self, kind: str, name: str, key: str) -> Any:
+        with self._lock:
+            queue = self._entries.get(key)
+            if queue:
+                entry = queue.popleft()
+                self._last[key] = entry
+            elif key in self._last:
+                entry = self._last[key]
+            else:
+                raise CassetteMiss(f"No recorded {kind} response for {name} (key {key[:12]}) in {self.path}")
+        if replay_latency == "original":
+            time.sleep(entry["latency"])
+        return decode(entry["response"])
+
+    def call(self, kind: str, name: str, payload: Any, func: Callable[[], Any]) -> Any:
+        key = request_key(kind, name, payload)
+        if self.mode == "replay":
+            return self._replay(kind, name, key)
+        start = time.monotonic()
+        response = func()
+        self._record(kind, name, key, response, time.monotonic() - start)
+        return response
+
+_cassette: Cassette | None = None
+_cassette_lock = threading.Lock()
+
+def get_cassette() -> Cassette | None:
+    global _cassette
+    if cassette_mode not in ("record", "replay"):
+        return None
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(cassette_path, cassette_mode)
+        return _cassette
+
+def tool_call(name: str, func: Callable, *args, **kwargs) -> Any:
+    cassette = get_cassette()
+    if cassette is None:
+        return func(*args, **kwargs)
+    return cassette.call("tool", name, {"args": list(args), "kwargs": kwargs}, lambda: func(*args, **kwargs))
+
+class CassetteRunnable(Runnable):
+    """Records or replays a chat model's responses keyed by the canonical message list."""
+
+    def __init__(self, runnable: Runnable, name: str):
+        self.runnable = runnable
+        self.name = name
+
+    def invoke(self, input, config=None, **kwargs):
+        cassette = get_cassette()
+        if cassette is None:
+            return self.runnable.invoke(input, config, **kwargs)
+        return cassette.call(
+            "llm", self.name, canonical_messages(input),
+            lambda: self.runnable.invoke(input, config, **kwargs)
+        )
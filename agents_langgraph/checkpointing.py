@@ -0,0 +1,61 @@
+import os
+import logging
+import sqlite3
+from typing import Optional
+from .registry import registry
+
+# AGENT_CHECKPOINTS=off compiles the graph without a checkpointer.
+checkpoints_enabled = os.getenv("AGENT_CHECKPOINTS", "on").lower() not in ("0", "off", "false")
+checkpoint_db_path = os.getenv(
+    "AGENT_CHECKPOINT_DB",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "checkpoints", "graph.sqlite")
+)
+max_checkpoint_threads = int(os.getenv("AGENT_CHECKPOINT_MAX_THREADS", "200"))
+
+def build_checkpointer():
+    """SQLite checkpointer shared by every question; one thread per task_id."""
+    if not checkpoints_enabled:
+        return None
+    from langgraph.checkpoint.sqlite import SqliteSaver
+    os.makedirs(os.path.dirname(checkpoint_db_path) or ".", exist_ok=True)
+    saver = SqliteSaver(sqlite3.connect(checkpoint_db_path, check_same_thread=False))
+    saver.setup()
+    prune_threads(saver)
+    return saver
+
+def get_checkpointer():
+    return registry.get("checkpointer")
+
+def prune_threads(saver, keep: int = max_checkpoint_threads) -> None:
+    """Drops every thread except the `keep` most recently checkpointed ones (checkpoint ids sort by time)."""
+    with saver.lock, saver.conn:
+        stale = [row[0] for row in saver.conn.execute(
+            "SELECT thread_id FROM checkpoints GROUP BY thread_id ORDER BY MAX(checkpoint_id) DESC LIMIT -1 OFFSET ?",
+            (keep,),
+        )]
+        for thread_id in stale:
+            saver.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            saver.conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+    if stale:
+        logging.info(f"Pruned checkpoints of {len(stale)} old threads")
+
+def compact_thread(saver, thread_id: str) -> None:
+    """Keeps only a thread's latest checkpoint, which is all a resume needs.
+
+    Each SQLite checkpoint stores the full state, so without this a long trajectory
+    grows quadratically with the number of steps.
+    """
+    with saver.lock, saver.conn:
+        row = saver.conn.execute(
+            "SELECT MAX(checkpoint_id) FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ''", (thread_id,)
+        ).fetchone()
+        if not row or row[0] is None:
+            return
+        saver.conn.execute("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id != ?", (thread_id, row[0]))
+        saver.conn.execute("DELETE FROM writes WHERE thread_id = ? AND checkpoint_id != ?", (thread_id, row[0]))
+
+def delete_thread(saver: Optional[object], thread_id: str) -> None:
+    if saver is not None:
+        saver.delete_thread(thread_id)
+
+registry.register("checkpointer", build_checkpointer)
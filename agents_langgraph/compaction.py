@@ -0,0 +1,77 @@
+import os
+import hashlib
+import logging
+from langchain_core.messages import AIMessage, ToolMessage
+from .agent_state import AgentState
+from .rate_limiter import estimate_tokens
+
+history_token_budget = int(os.getenv("AGENT_HISTORY_TOKEN_BUDGET", "24000"))
+keep_recent_tool_messages = int(os.getenv("AGENT_KEEP_RECENT_TOOL_MESSAGES", "2"))
+compacted_tool_message_tokens = int(os.getenv("AGENT_COMPACTED_TOOL_MESSAGE_TOKENS", "300"))
+
+COMPACTED_MARKER = "[compacted]"
+
+def _digest(content) -> str:
+    return hashlib.sha1(str(content).encode("utf-8")).hexdigest()
+
+def _head(msg: ToolMessage, max_chars: int) -> str:
+    """Truncates a tool result to its first `max_chars` characters, marked as cut; not a summary.
+
+    Only applied to results the model has already had a turn to read in full.
+    """
+    text = " ".join(str(msg.content).split())
+    if len(text) <= max_chars:
+        return text
+    return f"{COMPACTED_MARKER} {msg.name or 'tool'} result, first {max_chars} of {len(text)} chars: {text[:max_chars]}..."
+
+def compact_history(state: AgentState) -> dict:
+    """Keeps the conversation sent to the model within the history token budget.
+
+    Only results the model has already responded to are touched: every ToolMessage
+    after the last AIMessage (all results of a parallel fan-out) is kept whole, and
+    so are the latest `keep_recent_tool_messages` overall. Of the rest, exact duplicates of a later result are replaced by a pointer, and if the history
+    is still over budget the oldest results are cut down to a short head, then to a
+    stub. Replacements keep the original message ids, so the add_messages reducer
+    swaps them in place.
+    """
+    messages = state.get("messages") or []
+    tool_positions = [i for i, m in enumerate(messages) if isinstance(m, ToolMessage)]
+    old_positions = tool_positions[:-keep_recent_tool_messages] if keep_recent_tool_messages else tool_positions
+    last_ai = max((i for i, m in enumerate(messages) if isinstance(m, AIMessage)), default=-1)
+    # Results after the last AIMessage are about to be read for the first time.
+    old_positions = [i for i in old_positions if i < last_ai]
+    if not old_positions:
+        return {}
+
+    replacements = {}
+    later_digests = {_digest(messages[i].content) for i in tool_positions if i not in old_positions}
+    for i in reversed(old_positions):
+        msg = messages[i]
+        digest = _digest(msg.content)
+        if digest in later_digests and not str(msg.content).startswith(COMPACTED_MARKER):
+            replacements[i] = f"{COMPACTED_MARKER} Same result as a later {msg.name or 'tool'} call."
+        later_digests.add(digest)
+
+    def content_of(i: int) -> str:
+        return str(replacements.get(i, messages[i].content))
+
+    tokens = estimate_tokens([content_of(i) for i in range(len(messages))])
+    for max_chars in (compacted_tool_message_tokens * 4, 0):
+        for i in old_positions:
+            if tokens <= history_token_budget:
+                break
+            msg = messages[i]
+            if max_chars:
+                summary = _head(msg, max_chars)
+            else:
+                summary = f"{COMPACTED_MARKER} {msg.name or 'tool'} result omitted to save context."
+            if len(summary) < len(content_of(i)):
+                tokens -= (len(content_of(i)) - len(summary)) // 4
+                replacements[i] = summary
+
+    if not replacements:
+        return {}
+    before = estimate_tokens(messages)
+    updated = [messages[i].model_copy(update={"content": content}) for i, content in sorted(replacements.items())]
+    logging.debug(f"Compacted {len(updated)} tool messages: ~{before} -> ~{tokens} tokens")
+    return {"messages": updated}
@@ -0,0 +1,260 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from .guest_names import NameIndex, write_name_index
+
+DATASET_NAME = "agents-course/unit3-invitees"
+default_index_dir = os.getenv(
+    "GUEST_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "indexes", "guests")
+)
+# GUEST_INDEX_CHECK=off trusts whatever index is on disk instead of asking the Hub for the dataset revision.
+fingerprint_check = os.getenv("GUEST_INDEX_CHECK", "on").lower() not in ("0", "off", "false")
+# Bumped whenever the on-disk layout changes, so older indexes are rebuilt.
+INDEX_VERSION = 2
+# Updates made since an index version was written, appended inside its directory (see guest_updates).
+UPDATE_LOG = "updates.jsonl"
+BM25_K1 = 1.5
+BM25_B = 0.75
+_token_re = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    return _token_re.findall(text.lower())
+
+def guest_text(guest: dict) -> str:
+    """The document text every retriever returns for a guest."""
+    return "\n".join([
+        f"Name: {guest['name']}",
+        f"Relation: {guest['relation']}",
+        f"Description: {guest['description']}",
+        f"Email: {guest['email']}"
+    ])
+
+def content_fingerprint(guests: List[dict]) -> str:
+    digest = hashlib.sha256()
+    for guest in guests:
+        digest.update(json.dumps(guest, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    return "content-" + digest.hexdigest()[:16]
+
+def hub_fingerprint(dataset_name: str = DATASET_NAME) -> Optional[str]:
+    """The dataset's current Hub revision, or None when offline or the Hub cannot be reached."""
+    if os.getenv("HF_HUB_OFFLINE") == "1":
+        return None
+    try:
+        from huggingface_hub import HfApi
+        return "hub-" + HfApi().dataset_info(dataset_name, timeout=5).sha
+    except Exception as e:
+        logging.warning(f"Could not read the Hub revision of {dataset_name}: {e}")
+        return None
+
+class GuestIndex:
+    """BM25 term statistics for the guest documents, stored as memory-mapped numpy arrays.
+
+    Postings are kept term-major (term_ptr, post_docs, post_tfs), so opening the
+    index maps the files without reading them; guest_search scores them. Document
+    texts and names live in UTF-8 blobs with offset arrays and are decoded only
+    for returned hits. The name lookups of guest_names are stored alongside.
+    """
+
+    ARRAYS = ("doc_lengths", "doc_freqs", "term_ptr", "post_docs", "post_tfs",
+              "text_offsets", "name_offsets")
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        with open(os.path.join(path, "vocab.json"), encoding="utf-8") as f:
+            self.vocab: Dict[str, int] = json.load(f)
+        for name in self.ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+        self._texts = np.memmap(os.path.join(path, "texts.bin"), dtype=np.uint8, mode="r") \
+            if self.text_offsets[-1] else np.zeros(0, dtype=np.uint8)
+        self._names = np.memmap(os.path.join(path, "names.bin"), dtype=np.uint8, mode="r") \
+            if self.name_offsets[-1] else np.zeros(0, dtype=np.uint8)
+        self.num_docs = int(self.manifest["num_docs"])
+        self.avgdl = float(self.manifest["avgdl"])
+        self.fingerprint = self.manifest["fingerprint"]
+        self.generation = self.manifest.get("generation", 0)
+        self.version = self.manifest.get("version", 1)
+        self.name_index = NameIndex(path) if self.version >= 2 else None
+
+    def __len__(self) -> int:
+        return self.num_docs
+
+    def text(self, doc_id: int) -> str:
+        return bytes(self._texts[self.text_offsets[doc_id]:self.text_offsets[doc_id + 1]]).decode("utf-8")
+
+    def name(self, doc_id: int) -> str:
+        return bytes(self._names[self.name_offsets[doc_id]:self.name_offsets[doc_id + 1]]).decode("utf-8")
+
+def build_index(guests: Iterable[dict], fingerprint: str, root: str = default_index_dir) -> str:
+    """Tokenizes the guests and writes a new index directory under `root`, returning its path."""
+    return write_index(((str(guest["name"]), guest_text(guest)) for guest in guests), fingerprint, root)
+
+def write_index(docs: Iterable[Tuple[str, str]], fingerprint: str, root: str = default_index_dir,
+                generation: int = 0, activate: bool = True) -> str:
+    """Writes the (name, text) documents as a new index directory under `root`, returning its path.
+
+    Compacting live updates (guest_updates) writes later generations of the same
+    dataset fingerprint. Unless `activate` is False the new directory becomes
+    CURRENT and older index versions are removed (see activate_version).
+    """
+    version = f"{fingerprint}.{generation}" if generation else fingerprint
+    names: List[str] = []
+    text_bytes: List[bytes] = []
+    vocab: Dict[str, int] = {}
+    # One (term id, doc id, tf) triple per posting, in compact buffers so millions of guests fit in memory.
+    term_ids, post_docs, post_tfs = array("i"), array("i"), array("i")
+    doc_lengths = array("i")
+    for doc_id, (name, text) in enumerate(docs):
+        names.append(name)
+        text_bytes.append(text.encode("utf-8"))
+        counts = Counter(tokenize(text))
+        doc_lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            term_ids.append(vocab.setdefault(term, len(vocab)))
+            post_docs.append(doc_id)
+            post_tfs.append(tf)
+    term_ids = np.frombuffer(term_ids, dtype=np.int32)
+    # A stable sort groups postings by term and keeps each term's documents in ascending order.
+    order = np.argsort(term_ids, kind="stable")
+    doc_freqs = np.bincount(term_ids, minlength=len(vocab)).astype(np.int32)
+    term_ptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    term_ptr[1:] = np.cumsum(doc_freqs)
+    doc_lengths = np.frombuffer(doc_lengths, dtype=np.int32)
+    name_bytes = [n.encode("utf-8") for n in names]
+
+    os.makedirs(root, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=root, prefix=".build-")
+    arrays = {
+        "doc_lengths": doc_lengths,
+        "doc_freqs": doc_freqs,
+        "term_ptr": term_ptr,
+        "post_docs": np.frombuffer(post_docs, dtype=np.int32)[order],
+        "post_tfs": np.frombuffer(post_tfs, dtype=np.int32)[order],
+        "text_offsets": np.concatenate([[0], np.cumsum([len(b) for b in text_bytes])]).astype(np.int64),
+        "name_offsets": np.concatenate([[0], np.cumsum([len(b) for b in name_bytes])]).astype(np.int64),
+    }
+    for name, values in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), values)
+    with open(os.path.join(tmp_dir, "texts.bin"), "wb") as f:
+        f.write(b"".join(text_bytes))
+    with open(os.path.join(tmp_dir, "names.bin"), "wb") as f:
+        f.write(b"".join(name_bytes))
+    with open(os.path.join(tmp_dir, "vocab.json"), "w", encoding="utf-8") as f:
+        json.dump(vocab, f, ensure_ascii=False)
+    write_name_index(tmp_dir, names)
+    manifest = {
+        "version": INDEX_VERSION,
+        "dataset": DATASET_NAME,
+        "fingerprint": fingerprint,
+        "generation": generation,
+        "num_docs": len(names),
+        "num_terms": len(vocab),
+        "avgdl": float(doc_lengths.mean()) if len(names) else 0.0,
+        "k1": BM25_K1,
+        "b": BM25_B,
+    }
+    with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+
+    path = os.path.join(root, version)
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_dir, path)
+    if activate:
+        activate_version(root, version)
+    logging.info(f"Built guest index {version}: {len(names)} guests, {len(vocab)} terms at {path}")
+    return path
+
+def _is_index_version(path: str) -> bool:
+    """True for a directory this module wrote: one holding a guest index manifest."""
+    try:
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+            return json.load(f).get("dataset") == DATASET_NAME
+    except (OSError, ValueError, AttributeError):
+        return False
+
+def activate_version(root: str, version: str) -> None:
+    """Points CURRENT at `version` and removes older index versions, keeping the one it replaces.
+
+    The replaced version stays so CURRENT can be pointed back at it; anything in
+    `root` that is not a guest index version is left alone.
+    """
+    previous = current_index_path(root)
+    _write_current(root, version)
+    keep = {version, os.path.basename(previous) if previous else None}
+    for entry in os.listdir(root):
+        path = os.path.join(root, entry)
+        if entry not in keep and not entry.startswith(".") and _is_index_version(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+def _write_current(root: str, fingerprint: str) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=root, prefix=".current-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(fingerprint)
+    os.replace(tmp_path, os.path.join(root, "CURRENT"))
+
+def current_index_path(root: str = default_index_dir) -> Optional[str]:
+    try:
+        with open(os.path.join(root, "CURRENT"), encoding="utf-8") as f:
+            path = os.path.join(root, f.read().strip())
+    except FileNotFoundError:
+        return None
+    return path if os.path.exists(os.path.join(path, "manifest.json")) else None
+
+def load_guests(dataset_name: str = DATASET_NAME) -> List[dict]:
+    import datasets
+    logging.info(f"Loading {dataset_name} from Hugging Face Hub to build the guest index...")
+    return [dict(guest) for guest in datasets.load_dataset(dataset_name, split="train")]
+
+def load_or_build(root: str = default_index_dir, check: bool = fingerprint_check) -> GuestIndex:
+    """Opens the stored index, rebuilding it only if missing, outdated or if the dataset's Hub revision changed."""
+    path = current_index_path(root)
+    remote = hub_fingerprint() if check else None
+    if path is not None:
+        index = GuestIndex(path)
+        if index.version != INDEX_VERSION:
+            logging.info(f"Guest index {index.fingerprint} has layout version {index.version}; rebuilding the index.")
+        elif remote is None or index.fingerprint == remote:
+            logging.info(f"Loaded guest index {index.fingerprint} with {len(index)} guests from {path}")
+            return index
+        else:
+            logging.info(f"Guest dataset changed ({index.fingerprint} -> {remote}); rebuilding the index.")
+            if index.generation or os.path.exists(os.path.join(path, UPDATE_LOG)):
+                logging.warning("Guests added, updated or deleted since the last dataset build are discarded by the rebuild.")
+    guests = load_guests()
+    return GuestIndex(build_index(guests, remote or content_fingerprint(guests), root))
+
+_index: Optional[GuestIndex] = None
+_index_lock = threading.Lock()
+
+def get_guest_index() -> GuestIndex:
+    """The process-wide guest index, opened on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = load_or_build()
+        return _index
+
+if __name__ == "__main__":
+    import argparse
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Build the persisted guest BM25 index.")
+    parser.add_argument("--dir", default=default_index_dir)
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the stored index is current.")
+    args = parser.parse_args()
+    if args.force:
+        guests = load_guests()
+        build_index(guests, hub_fingerprint() or content_fingerprint(guests), args.dir)
+    else:
+        load_or_build(args.dir)
@@ -0,0 +1,201 @@
+import os
+import json
+import math
+import bisect
+import unicodedata
+from array import array
+from dataclasses import dataclass
+from typing import AbstractSet, Dict, List, Optional, Set, Tuple
+import numpy as np
+
+# Share of a query's trigrams a name must contain to count as a misspelling of it.
+name_similarity = float(os.getenv("GUEST_NAME_SIMILARITY", "0.6"))
+# Longer queries are questions rather than names and go straight to BM25.
+max_name_words = int(os.getenv("GUEST_NAME_MAX_WORDS", "5"))
+MIN_PREFIX_CHARS = 3
+
+def normalize_name(text: str) -> str:
+    """Lowercase words without accents or punctuation: "Dr. Nikola Tesla" -> "dr nikola tesla"."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join("".join(c if c.isalnum() else " " for c in text.lower()).split())
+
+def name_keys(key: str) -> List[str]:
+    """The normalized name and every tail of it starting at a word, so last names are keys too."""
+    words = key.split()
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+def trigrams(key: str) -> Set[str]:
+    """Character trigrams of each word, padded like pg_trgm so word starts and ends count."""
+    grams = set()
+    for word in key.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def match_name(query_key: str, name_key: str) -> Optional[Tuple[str, float]]:
+    """How one normalized name matches a normalized query, with the tiers and scores of NameIndex.lookup."""
+    if not query_key or len(query_key.split()) > max_name_words:
+        return None
+    keys = name_keys(name_key)
+    if query_key in keys:
+        return "exact", 1.0
+    if any(key.startswith(query_key + " ") for key in keys):
+        return "word_prefix", 1.0
+    if len(query_key) < MIN_PREFIX_CHARS:
+        return None
+    if any(key.startswith(query_key) for key in keys):
+        return "prefix", 1.0
+    grams = trigrams(query_key)
+    common = len(grams & trigrams(name_key))
+    if common >= math.ceil(name_similarity * len(grams)):
+        return "fuzzy", common / len(grams)
+    return None
+
+@dataclass
+class NameMatch:
+    doc_id: int
+    score: float
+    match: str
+
+def write_name_index(path: str, names: List[str]) -> None:
+    """Writes the sorted name keys and trigram postings for `names` (one per document) into `path`."""
+    keys = []
+    vocab: Dict[str, int] = {}
+    # (trigram id, doc id) pairs in compact buffers; millions of names would not fit as Python lists.
+    gram_ids, gram_docs = array("i"), array("i")
+    trigram_counts = np.zeros(len(names), dtype=np.int32)
+    for doc_id, name in enumerate(names):
+        key = normalize_name(name)
+        keys.extend((k.encode("utf-8"), doc_id) for k in name_keys(key))
+        grams = trigrams(key)
+        trigram_counts[doc_id] = len(grams)
+        for gram in grams:
+            gram_ids.append(vocab.setdefault(gram, len(vocab)))
+            gram_docs.append(doc_id)
+    keys.sort()
+    gram_ids = np.frombuffer(gram_ids, dtype=np.int32)
+    # A stable sort keeps each trigram's documents in ascending order.
+    order = np.argsort(gram_ids, kind="stable")
+    trigram_ptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    trigram_ptr[1:] = np.cumsum(np.bincount(gram_ids, minlength=len(vocab)))
+    arrays = {
+        "name_key_offsets": np.concatenate([[0], np.cumsum([len(k) for k, _ in keys])]).astype(np.int64),
+        "name_key_docs": np.array([d for _, d in keys], dtype=np.int32),
+        "trigram_ptr": trigram_ptr,
+        "trigram_docs": np.frombuffer(gram_docs, dtype=np.int32)[order],
+        "trigram_counts": trigram_counts,
+    }
+    for name, values in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), values)
+    with open(os.path.join(path, "name_keys.bin"), "wb") as f:
+        f.write(b"".join(k for k, _ in keys))
+    with open(os.path.join(path, "trigrams.json"), "w", encoding="utf-8") as f:
+        json.dump(vocab, f, ensure_ascii=False)
+
+class _SortedKeys:
+    """Sequence view over the sorted UTF-8 name keys, decoded only where bisect looks."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+
+class NameIndex:
+    """Exact, prefix and trigram lookups over guest names, stored next to the BM25 arrays.
+
+    Every word-started tail of each normalized name is a key in one sorted blob, so
+    full names, last names and their prefixes are found by binary search. Names
+    that match none of those are looked up by character trigrams, which tolerates
+    typos; only the rarest trigrams of the query are expanded into candidates.
+    """
+
+    ARRAYS = ("name_key_offsets", "name_key_docs", "trigram_ptr", "trigram_docs", "trigram_counts")
+
+    def __init__(self, path: str):
+        for name in self.ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+        blob = np.memmap(os.path.join(path, "name_keys.bin"), dtype=np.uint8, mode="r") \
+            if self.name_key_offsets[-1] else np.zeros(0, dtype=np.uint8)
+        self.keys = _SortedKeys(blob, self.name_key_offsets)
+        with open(os.path.join(path, "trigrams.json"), encoding="utf-8") as f:
+            self.trigram_vocab: Dict[str, int] = json.load(f)
+
+    def _key_range(self, low: bytes, high: bytes):
+        return bisect.bisect_left(self.keys, low), bisect.bisect_left(self.keys, high)
+
+    def _docs_in_range(self, start: int, stop: int, k: int, exclude: AbstractSet[int]) -> List[int]:
+        docs: List[int] = []
+        for i in range(start, stop):
+            doc_id = int(self.name_key_docs[i])
+            if doc_id not in docs and doc_id not in exclude:
+                docs.append(doc_id)
+                if len(docs) == k:
+                    break
+        return docs
+
+    def fuzzy(self, key: str, k: int, exclude: AbstractSet[int] = frozenset()) -> List[NameMatch]:
+        """Names containing at least `name_similarity` of the query's trigrams, best first."""
+        grams = sorted(trigrams(key))
+        needed = math.ceil(name_similarity * len(grams))
+        ids = [self.trigram_vocab[g] for g in grams if g in self.trigram_vocab]
+        if not grams or len(ids) < needed:
+            return []
+        ids.sort(key=lambda i: self.trigram_ptr[i + 1] - self.trigram_ptr[i])
+        # A name sharing `needed` trigrams shares at least one of the rarest len(ids) - needed + 1.
+        rarest = len(ids) - needed + 1
+        candidates, common = np.unique(np.concatenate(
+            [self.trigram_docs[self.trigram_ptr[i]:self.trigram_ptr[i + 1]] for i in ids[:rarest]]
+        ), return_counts=True)
+        for n, i in enumerate(ids[rarest:], start=rarest):
+            # Drop candidates that cannot reach `needed` even with every trigram left.
+            keep = common + (len(ids) - n) >= needed
+            candidates, common = candidates[keep], common[keep]
+            docs = self.trigram_docs[self.trigram_ptr[i]:self.trigram_ptr[i + 1]]
+            positions = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+            common += docs[positions] == candidates
+        keep = common >= needed
+        if exclude:
+            keep &= ~np.isin(candidates, np.fromiter(exclude, dtype=np.int64))
+        candidates, common = candidates[keep], common[keep]
+        if not len(candidates):
+            return []
+        containment = common / len(grams)
+        jaccard = common / (len(grams) + np.asarray(self.trigram_counts[candidates]) - common)
+        top = np.lexsort((candidates, -jaccard, -containment))[:k]
+        return [NameMatch(int(candidates[i]), float(containment[i]), "fuzzy") for i in top]
+
+    def exact_candidates(self, key: str) -> List[int]:
+        """Documents with `key` as their whole normalized name or as one of its word tails."""
+        target = key.encode("utf-8")
+        start, stop = self._key_range(target, target + b"\x00")
+        return sorted({int(self.name_key_docs[i]) for i in range(start, stop)})
+
+    def lookup(self, query: str, k: int = 3, exclude: AbstractSet[int] = frozenset()) -> List[NameMatch]:
+        """Guests whose name matches `query` exactly, by word prefix, by prefix or by trigrams, in that order.
+
+        Documents in `exclude`, deleted since the index was written, are skipped.
+        """
+        key = normalize_name(query)
+        if not key or len(key.split()) > max_name_words:
+            return []
+        target = key.encode("utf-8")
+        # UTF-8 never contains 0xff, so it bounds every key that starts with `target`.
+        tiers = [
+            ("exact", target, target + b"\x00"),
+            ("word_prefix", target + b" ", target + b" \xff"),
+        ]
+        if len(key) >= MIN_PREFIX_CHARS:
+            tiers.append(("prefix", target, target + b"\xff"))
+        for match, low, high in tiers:
+            docs = self._docs_in_range(*self._key_range(low, high), k, exclude)
+            if docs:
+                return [NameMatch(doc_id, 1.0, match) for doc_id in docs]
+        if len(key) >= MIN_PREFIX_CHARS:
+            return self.fuzzy(key, k, exclude)
+        return []
@@ -0,0 +1,376 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from .guest_index import BM25_B, BM25_K1, GuestIndex, activate_version, get_guest_index, tokenize, write_index
+from .guest_names import normalize_name
+from .guest_updates import GuestSnapshot, append_update_log, compact_after, read_update_log
+from . import metrics
+
+# Scores at or below this are not hits. It only matters for terms found in nearly every
+# guest (e.g. "example" and "com" in the emails), whose idf shrinks towards 0 as the
+# list grows; without it such a term would match, and have to be scored for, every guest.
+MIN_SCORE = float(os.getenv("GUEST_SEARCH_MIN_SCORE", "0.001"))
+# Results kept per engine, keyed by normalized query; 0 disables the cache.
+cache_size = int(os.getenv("GUEST_SEARCH_CACHE_SIZE", "1024"))
+
+@dataclass
+class GuestHit:
+    doc_id: int
+    name: str
+    text: str
+    score: float
+    match: str = "bm25"
+
+class GuestSearchEngine:
+    """Guest search shared by the LangChain, LlamaIndex and smolagents tools.
+
+    Most queries are a guest's name, so the index's name lookups (guest_names) are
+    tried first; BM25 over the full guest text is the fallback.
+
+    For BM25 the index's term-major postings are the CSC form of a documents x
+    terms tf matrix, wrapped without copying the memory-mapped arrays, so each
+    term's column is a contiguous, doc-sorted slice. A query computes BM25 weights
+    only for the postings it reads and picks the top k with argpartition. Terms are
+    visited from the highest possible contribution down (MaxScore): once the terms
+    left could not lift an unseen guest into the top k, they only rescore the
+    current candidates with a binary search into their columns, so no query does
+    O(guests) work.
+
+    Results are kept in an LRU keyed by the normalized query, and search_many
+    answers a list of queries at once, sharing term weights across them.
+
+    Guests can be added, updated and deleted without a rebuild (guest_updates):
+    each update is logged next to the index and produces a new immutable
+    snapshot, which every query reads once, so it sees either all or none of an
+    update. After `compact_after` updates a background thread writes the live
+    guests as the next generation of the index and swaps it in.
+    """
+
+    def __init__(self, index: GuestIndex, k1: float = BM25_K1, b: float = BM25_B,
+                 min_score: float = MIN_SCORE, cache_entries: int = cache_size,
+                 compact_after: int = compact_after):
+        self.cache_entries = cache_entries
+        self._cache: "OrderedDict[Tuple, List[GuestHit]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.k1 = k1
+        self.b = b
+        self.min_score = min_score
+        self.compact_after = compact_after
+        self._write_lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+        self.snapshot = GuestSnapshot(index)
+        # Updates logged against the snapshot's index, replayed onto it after a restart.
+        self._updates = read_update_log(index.path)
+        for update in self._updates:
+            self.snapshot = self.snapshot.apply(update)
+        if self._updates:
+            logging.info(f"Replayed {len(self._updates)} guest updates onto guest index {index.fingerprint}")
+
+    @property
+    def index(self) -> GuestIndex:
+        return self.snapshot.index
+
+    def __len__(self) -> int:
+        return len(self.snapshot)
+
+    def idf(self, snapshot: GuestSnapshot, term_ids: np.ndarray) -> np.ndarray:
+        df = snapshot.doc_freqs(term_ids)
+        return np.log((len(snapshot) - df + 0.5) / (df + 0.5) + 1.0)
+
+    def weights(self, snapshot: GuestSnapshot, idf: float, tfs: np.ndarray, docs: np.ndarray) -> np.ndarray:
+        tfs = np.asarray(tfs, dtype=np.float64)
+        lengths = snapshot.lengths(docs)
+        return idf * tfs * (self.k1 + 1) / (tfs + self.k1 * (1 - self.b + self.b * lengths / snapshot.avgdl))
+
+    def _accumulate(self, docs: np.ndarray, weights: np.ndarray):
+        """Sums weights per document; `docs` is the candidates followed by a column, both doc-sorted."""
+        # A stable sort of two sorted runs is a linear merge.
+        order = np.argsort(docs, kind="stable")
+        docs, weights = docs[order], weights[order]
+        # Both runs hold each document at most once, so a document appears at most twice.
+        repeated = docs[1:] == docs[:-1]
+        weights[:-1][repeated] += weights[1:][repeated]
+        first = np.concatenate([[True], ~repeated])
+        return docs[first], weights[first]
+
+    def column_weights(self, snapshot: GuestSnapshot, term_id: int, idf: float, shared: Optional[Dict] = None):
+        """A term's (doc_ids, BM25 weights), reused from `shared` when a batch already computed them."""
+        if shared is not None and term_id in shared:
+            return shared[term_id]
+        docs, tfs = snapshot.column(term_id)
+        result = (np.asarray(docs), self.weights(snapshot, idf, tfs, docs))
+        if shared is not None:
+            shared[term_id] = result
+        return result
+
+    def score_candidates(self, query: str, k: int = 3, shared: Optional[Dict] = None,
+                         snapshot: Optional[GuestSnapshot] = None):
+        """Returns (doc_ids, scores) of every guest that can still rank in the top k for `query`."""
+        snapshot = snapshot or self.snapshot
+        term_ids = snapshot.term_ids(query)
+        doc_ids, scores = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+        if not len(term_ids):
+            return doc_ids, scores
+        idf = self.idf(snapshot, term_ids)
+        order = np.argsort(-idf, kind="stable")
+        term_ids, idf = term_ids[order], idf[order]
+        # Most a term can add to any guest's score, as tf grows and length shrinks.
+        remaining = np.cumsum((idf * (self.k1 + 1))[::-1])[::-1]
+        for i, (term_id, term_idf) in enumerate(zip(term_ids, idf)):
+            threshold = self.min_score
+            if len(scores) >= k:
+                threshold = max(threshold, np.partition(scores, len(scores) - k)[len(scores) - k])
+            if remaining[i] <= threshold:
+                # Unseen guests can no longer reach the top k; drop those that cannot either,
+                # and rescore the rest against the remaining columns.
+                keep = scores + remaining[i] >= threshold
+                doc_ids, scores = doc_ids[keep], scores[keep]
+                for term_id, term_idf in zip(term_ids[i:], idf[i:]):
+                    docs, tfs = snapshot.column(term_id)
+                    if not len(docs) or not len(doc_ids):
+                        continue
+                    # Same dtype as the column, or searchsorted would convert the whole column first.
+                    positions = np.minimum(np.searchsorted(docs, doc_ids.astype(docs.dtype)), len(docs) - 1)
+                    found = docs[positions] == doc_ids
+                    scores[found] += self.weights(snapshot, term_idf, tfs[positions[found]], doc_ids[found])
+                break
+            docs, weights = self.column_weights(snapshot, term_id, term_idf, shared)
+            if not len(doc_ids):
+                doc_ids, scores = docs, weights.copy()
+                continue
+            doc_ids, scores = self._accumulate(np.concatenate([doc_ids, docs]), np.concatenate([scores, weights]))
+        keep = scores > self.min_score
+        return doc_ids[keep], scores[keep]
+
+    def hit(self, snapshot: GuestSnapshot, doc_id: int, score: float, match: str = "bm25") -> GuestHit:
+        return GuestHit(doc_id, snapshot.name(doc_id), snapshot.text(doc_id), score, match)
+
+    def cache_key(self, query: str, k: int, snapshot: Optional[GuestSnapshot] = None) -> Tuple:
+        """Queries differing only in case, accents, punctuation or spacing share a key.
+
+        The snapshot's sequence number is part of the key, so a result computed
+        before an update is never served after it.
+        """
+        return normalize_name(query), " ".join(tokenize(query)), k, (snapshot or self.snapshot).seq
+
+    def _count(self, hit: bool) -> None:
+        with self._cache_lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+        metrics.observe_cache("guest_search", hit)
+
+    def _cached(self, key: Tuple) -> Optional[List[GuestHit]]:
+        with self._cache_lock:
+            hits = self._cache.get(key)
+            if hits is not None:
+                self._cache.move_to_end(key)
+        self._count(hits is not None)
+        return None if hits is None else list(hits)
+
+    def _remember(self, key: Tuple, hits: List[GuestHit]) -> None:
+        if self.cache_entries <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = list(hits)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    def cache_stats(self) -> Dict[str, float]:
+        with self._cache_lock:
+            total = self.cache_hits + self.cache_misses
+            return {
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "hit_rate": round(self.cache_hits / total, 3) if total else 0.0,
+                "entries": len(self._cache),
+            }
+
+    def clear_cache(self) -> None:
+        with self._cache_lock:
+            self._cache.clear()
+
+    def name_matches(self, query: str, k: int, snapshot: Optional[GuestSnapshot] = None) -> List[GuestHit]:
+        snapshot = snapshot or self.snapshot
+        return [self.hit(snapshot, m.doc_id, m.score, m.match) for m in snapshot.name_matches(query, k)]
+
+    def search(self, query: str, k: int = 3) -> List[GuestHit]:
+        """Guests whose name matches `query`, or else the top k by BM25."""
+        snapshot = self.snapshot
+        key = self.cache_key(query, k, snapshot)
+        hits = self._cached(key)
+        if hits is None:
+            hits = self.name_matches(query, k, snapshot) or self.bm25_search(query, k, snapshot)
+            self._remember(key, hits)
+        return hits
+
+    def search_many(self, queries: Sequence[str], k: int = 3) -> List[List[GuestHit]]:
+        """Results for each of `queries`, in order; cache misses not found by name share one BM25 pass."""
+        snapshot = self.snapshot
+        results: List[Optional[List[GuestHit]]] = [None] * len(queries)
+        pending: Dict[Tuple, List[int]] = {}
+        for i, query in enumerate(queries):
+            key = self.cache_key(query, k, snapshot)
+            if key in pending:
+                # Repeated within the batch: answered by the first occurrence's result.
+                pending[key].append(i)
+                self._count(True)
+                continue
+            results[i] = self._cached(key)
+            if results[i] is None:
+                pending[key] = [i]
+        fallback = []
+        for key, positions in pending.items():
+            hits = self.name_matches(queries[positions[0]], k, snapshot)
+            if hits:
+                self._remember(key, hits)
+                for i in positions:
+                    results[i] = list(hits)
+            else:
+                fallback.append(key)
+        if fallback:
+            batch = self.bm25_search_many([queries[pending[key][0]] for key in fallback], k, snapshot)
+            for key, hits in zip(fallback, batch):
+                self._remember(key, hits)
+                for i in pending[key]:
+                    results[i] = list(hits)
+        return results
+
+    def bm25_search(self, query: str, k: int = 3, snapshot: Optional[GuestSnapshot] = None) -> List[GuestHit]:
+        """Top-k guests for `query` by BM25; guests sharing no informative term with the query are never returned."""
+        snapshot = snapshot or self.snapshot
+        return self._top_k(snapshot, *self.score_candidates(query, k, snapshot=snapshot), k)
+
+    def _top_k(self, snapshot: GuestSnapshot, doc_ids: np.ndarray, scores: np.ndarray, k: int) -> List[GuestHit]:
+        """The k best of doc-sorted candidates, highest score first and ties by document order."""
+        if not len(doc_ids):
+            return []
+        if len(doc_ids) > k:
+            kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+            above = np.flatnonzero(scores > kth)
+            # Candidates are doc-sorted, so ties at the cut go to the earliest guests.
+            top = np.concatenate([above, np.flatnonzero(scores == kth)[:k - len(above)]])
+        else:
+            top = np.arange(len(doc_ids))
+        top = top[np.lexsort((doc_ids[top], -scores[top]))]
+        return [self.hit(snapshot, int(doc_ids[i]), float(scores[i])) for i in top]
+
+    def bm25_search_many(self, queries: Sequence[str], k: int = 3,
+                         snapshot: Optional[GuestSnapshot] = None) -> List[List[GuestHit]]:
+        """Top-k BM25 hits for each query; the same results as bm25_search.
+
+        A term's column weights are computed once per batch and reused by every
+        query containing it, so lookups that share words (relations, topics,
+        surnames) share most of their scoring work.
+        """
+        snapshot = snapshot or self.snapshot
+        shared: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        return [self._top_k(snapshot, *self.score_candidates(query, k, shared, snapshot), k) for query in queries]
+
+    def add_guest(self, guest: dict) -> None:
+        """Adds a guest (name, relation, description, email); ValueError if the name is taken."""
+        self._update({"op": "add", "guest": dict(guest)})
+
+    def update_guest(self, guest: dict) -> None:
+        """Replaces the record of the guest with this name; KeyError if there is none."""
+        self._update({"op": "update", "guest": dict(guest)})
+
+    def delete_guest(self, name: str) -> None:
+        """Removes the guest with this name; KeyError if there is none."""
+        self._update({"op": "delete", "name": name})
+
+    def _update(self, update: dict) -> None:
+        with self._write_lock:
+            # Validated before it is logged, so the log only holds updates that apply.
+            snapshot = self.snapshot.apply(update)
+            append_update_log(snapshot.index.path, [update])
+            self._updates.append(update)
+            self.snapshot = snapshot
+            start = len(self._updates) >= self.compact_after > 0 and self._compactor is None
+            if start:
+                self._compactor = threading.Thread(target=self._compact, name="guest-index-compaction", daemon=True)
+                self._compactor.start()
+        self.clear_cache()
+
+    def compact(self) -> None:
+        """Writes the live guests as the next index generation now, after any compaction already running."""
+        with self._compact_lock:
+            self._compact_once()
+
+    def _compact(self) -> None:
+        """The background compaction, repeated while updates made meanwhile are over the threshold."""
+        try:
+            while True:
+                with self._compact_lock:
+                    self._compact_once()
+                with self._write_lock:
+                    if len(self._updates) < self.compact_after:
+                        self._compactor = None
+                        return
+        except Exception:
+            logging.exception("Guest index compaction failed; updates stay in the update log")
+            with self._write_lock:
+                self._compactor = None
+
+    def _compact_once(self) -> None:
+        with self._write_lock:
+            snapshot, applied = self.snapshot, len(self._updates)
+        if not applied:
+            return
+        index = snapshot.index
+        root = os.path.dirname(index.path)
+        # Written outside the lock: queries and further updates go on against the old index meanwhile.
+        path = write_index(snapshot.live_docs(), index.fingerprint, root,
+                           generation=index.generation + 1, activate=False)
+        compacted = GuestSnapshot(GuestIndex(path), seq=snapshot.seq)
+        with self._write_lock:
+            later = self._updates[applied:]
+            for update in later:
+                compacted = compacted.apply(update)
+            append_update_log(path, later)
+            activate_version(root, os.path.basename(path))
+            self._updates = later
+            self.snapshot = compacted
+        self.clear_cache()
+        logging.info(f"Compacted {applied} guest updates into {path}")
+
+def format_hits(hits: List[GuestHit], separator: str = "\n\n") -> str:
+    if not hits:
+        return "No matching guest information found."
+    return separator.join(hit.text for hit in hits)
+
+def format_batch(queries: Sequence[str], results: List[List[GuestHit]], separator: str = "\n\n") -> str:
+    """One section per query, headed by the query, in the order they were asked."""
+    return "\n\n".join(f"### {query}\n{format_hits(hits, separator)}" for query, hits in zip(queries, results))
+
+_engine: Optional[GuestSearchEngine] = None
+_engine_lock = threading.Lock()
+
+def get_guest_search() -> GuestSearchEngine:
+    """The process-wide search engine over the persisted guest index, opened on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = GuestSearchEngine(get_guest_index())
+        return _engine
+
+def search_guests(query: str, k: int = 3, separator: str = "\n\n") -> str:
+    """Formatted top-k guest records for `query`; what every framework's guest tool returns."""
+    return format_hits(get_guest_search().search(query, k), separator)
+
+def search_guests_many(queries: Sequence[str], k: int = 3, separator: str = "\n\n") -> str:
+    """Formatted top-k guest records for each of `queries`; what the batch guest tools return."""
+    return format_batch(queries, get_guest_search().search_many(queries, k), separator)
+
+def log_cache_stats() -> None:
+    if _engine is not None:
+        logging.info(f"[CACHE] guest_search: {_engine.cache_stats()}")
@@ -0,0 +1,282 @@
+import os
+import json
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from scipy import sparse
+from .guest_index import UPDATE_LOG, GuestIndex, guest_text, tokenize
+from .guest_names import NameMatch, match_name, name_keys, normalize_name, trigrams
+
+# Updates applied on top of an index before they are compacted into a new generation of it.
+compact_after = int(os.getenv("GUEST_INDEX_COMPACT_AFTER", "256"))
+_TIERS = {"exact": 0, "word_prefix": 1, "prefix": 2, "fuzzy": 3}
+
+@dataclass(frozen=True)
+class DeltaDoc:
+    """A guest added or updated since the index was written."""
+    key: str
+    name: str
+    text: str
+    counts: Dict[int, int]
+    length: int
+
+class GuestSnapshot:
+    """An immutable view of the guest list: a written index plus the updates made since.
+
+    Added and updated guests get document ids after the index's own; deleted ones
+    (including the old version of an updated guest) are masked out of every
+    column. Document frequencies, the live guest count and the total length are
+    adjusted as updates are applied, so BM25 scores are those of a full rebuild.
+    `apply` returns a new snapshot and never changes this one, so a query that
+    reads one snapshot sees a consistent guest list while updates go on.
+    """
+
+    def __init__(self, index: GuestIndex, tf: Optional[sparse.csc_matrix] = None, seq: int = 0):
+        self.index = index
+        self.tf = tf if tf is not None else sparse.csc_matrix(
+            (index.post_tfs, index.post_docs, index.term_ptr),
+            shape=(index.num_docs, len(index.vocab)), copy=False,
+        )
+        self.seq = seq
+        self.base_docs = index.num_docs
+        self.base_terms = len(index.vocab)
+        self.deleted: frozenset = frozenset()
+        self.deleted_ids = np.zeros(0, dtype=np.int64)
+        self.delta: Tuple[DeltaDoc, ...] = ()
+        self.delta_keys: Dict[str, int] = {}
+        self.delta_lengths = np.zeros(0, dtype=np.int32)
+        self.delta_postings: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self.extra_vocab: Dict[str, int] = {}
+        self.df_adjust: Dict[int, int] = {}
+        self.num_docs = index.num_docs
+        self.total_length = int(np.asarray(index.doc_lengths, dtype=np.int64).sum())
+        # Columns with deletions or additions, merged once per snapshot on first use.
+        self._columns: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return self.num_docs
+
+    @property
+    def avgdl(self) -> float:
+        return self.total_length / self.num_docs if self.num_docs else 1.0
+
+    def term_id(self, term: str) -> Optional[int]:
+        term_id = self.index.vocab.get(term)
+        return term_id if term_id is not None else self.extra_vocab.get(term)
+
+    def term_ids(self, query: str) -> np.ndarray:
+        ids = {self.term_id(t) for t in tokenize(query)}
+        ids.discard(None)
+        return np.array(sorted(ids), dtype=np.int64)
+
+    def doc_freqs(self, term_ids: np.ndarray) -> np.ndarray:
+        df = np.zeros(len(term_ids), dtype=np.float64)
+        base = term_ids < self.base_terms
+        df[base] = self.index.doc_freqs[term_ids[base]]
+        if self.df_adjust:
+            df += [self.df_adjust.get(int(t), 0) for t in term_ids]
+        return df
+
+    def column(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """The live (doc_ids, tfs) postings of one term, doc-sorted."""
+        cached = self._columns.get(term_id)
+        if cached is not None:
+            return cached
+        if term_id < self.base_terms:
+            start, stop = self.tf.indptr[term_id], self.tf.indptr[term_id + 1]
+            docs, tfs = self.tf.indices[start:stop], self.tf.data[start:stop]
+        else:
+            docs, tfs = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32)
+        added = self.delta_postings.get(term_id)
+        if added is None and not self.deleted:
+            # Untouched by updates: views into the memory-mapped index.
+            return docs, tfs
+        if added is not None:
+            docs, tfs = np.concatenate([docs, added[0]]), np.concatenate([tfs, added[1]])
+        if len(self.deleted_ids) and len(docs):
+            keep = ~np.isin(docs, self.deleted_ids, assume_unique=True)
+            docs, tfs = docs[keep], tfs[keep]
+        self._columns[term_id] = docs, tfs
+        return docs, tfs
+
+    def lengths(self, docs: np.ndarray) -> np.ndarray:
+        if not len(self.delta):
+            return np.asarray(self.index.doc_lengths[docs], dtype=np.float64)
+        docs = np.asarray(docs)
+        lengths = np.empty(len(docs), dtype=np.float64)
+        base = docs < self.base_docs
+        lengths[base] = self.index.doc_lengths[docs[base]]
+        lengths[~base] = self.delta_lengths[docs[~base] - self.base_docs]
+        return lengths
+
+    def name(self, doc_id: int) -> str:
+        if doc_id < self.base_docs:
+            return self.index.name(doc_id)
+        return self.delta[doc_id - self.base_docs].name
+
+    def text(self, doc_id: int) -> str:
+        if doc_id < self.base_docs:
+            return self.index.text(doc_id)
+        return self.delta[doc_id - self.base_docs].text
+
+    def find(self, key: str) -> Optional[int]:
+        """The live document whose normalized name is `key`, if any."""
+        if key in self.delta_keys:
+            return self.delta_keys[key]
+        if self.index.name_index is None:
+            return None
+        for doc_id in self.index.name_index.exact_candidates(key):
+            if doc_id not in self.deleted and normalize_name(self.index.name(doc_id)) == key:
+                return doc_id
+        return None
+
+    def name_matches(self, query: str, k: int) -> List[NameMatch]:
+        """NameIndex.lookup over the live guests: the best tier found in the index or among updates."""
+        matches = [] if self.index.name_index is None else self.index.name_index.lookup(query, k, self.deleted)
+        key = normalize_name(query)
+        added = []
+        for doc_key, doc_id in self.delta_keys.items():
+            found = match_name(key, doc_key)
+            if found is not None:
+                added.append(NameMatch(doc_id, found[1], found[0]))
+        if not added:
+            return matches
+        matches += added
+        best = min(_TIERS[m.match] for m in matches)
+        matches = [m for m in matches if _TIERS[m.match] == best]
+        matches.sort(key=lambda m: self._match_order(key, m))
+        return matches[:k]
+
+    def _match_order(self, key: str, match: NameMatch) -> tuple:
+        """Sort key giving merged matches the order NameIndex.lookup returns them in."""
+        name_key = normalize_name(self.name(match.doc_id))
+        if match.match == "fuzzy":
+            grams, name_grams = trigrams(key), trigrams(name_key)
+            common = len(grams & name_grams)
+            return -match.score, -common / (len(grams) + len(name_grams) - common), match.doc_id
+        # The index lists each guest at the first of its sorted name keys in the matched range.
+        prefix = key + " " if match.match == "word_prefix" else key
+        keys = [k.encode("utf-8") for k in name_keys(name_key)
+                if (k == key if match.match == "exact" else k.startswith(prefix))]
+        return min(keys), match.doc_id
+
+    def live_docs(self) -> Iterator[Tuple[str, str]]:
+        """(name, text) of every live guest in document order; what compaction writes."""
+        for doc_id in range(self.base_docs):
+            if doc_id not in self.deleted:
+                yield self.index.name(doc_id), self.index.text(doc_id)
+        for i, doc in enumerate(self.delta):
+            if self.base_docs + i not in self.deleted:
+                yield doc.name, doc.text
+
+    def _counts(self, doc_id: int) -> Dict[int, int]:
+        if doc_id >= self.base_docs:
+            return self.delta[doc_id - self.base_docs].counts
+        counts = Counter(tokenize(self.index.text(doc_id)))
+        return {self.index.vocab[term]: tf for term, tf in counts.items()}
+
+    def _length(self, doc_id: int) -> int:
+        if doc_id >= self.base_docs:
+            return int(self.delta_lengths[doc_id - self.base_docs])
+        return int(self.index.doc_lengths[doc_id])
+
+    def _copy(self) -> "GuestSnapshot":
+        snapshot = object.__new__(GuestSnapshot)
+        snapshot.__dict__.update(self.__dict__)
+        snapshot.seq = self.seq + 1
+        snapshot.extra_vocab = dict(self.extra_vocab)
+        snapshot.df_adjust = dict(self.df_adjust)
+        snapshot.delta_postings = dict(self.delta_postings)
+        snapshot.delta_keys = dict(self.delta_keys)
+        snapshot._columns = {}
+        return snapshot
+
+    def _delete(self, doc_id: int) -> None:
+        for term_id in self._counts(doc_id):
+            self.df_adjust[term_id] = self.df_adjust.get(term_id, 0) - 1
+        self.num_docs -= 1
+        self.total_length -= self._length(doc_id)
+        self.deleted = self.deleted | {doc_id}
+        self.deleted_ids = np.sort(np.append(self.deleted_ids, doc_id))
+        key = normalize_name(self.name(doc_id))
+        if self.delta_keys.get(key) == doc_id:
+            del self.delta_keys[key]
+
+    def _add(self, guest: dict) -> None:
+        name, text = str(guest["name"]), guest_text(guest)
+        doc_id = self.base_docs + len(self.delta)
+        counts: Dict[int, int] = {}
+        for term, tf in Counter(tokenize(text)).items():
+            term_id = self.term_id(term)
+            if term_id is None:
+                term_id = self.extra_vocab[term] = self.base_terms + len(self.extra_vocab)
+            counts[term_id] = tf
+            self.df_adjust[term_id] = self.df_adjust.get(term_id, 0) + 1
+            docs, tfs = self.delta_postings.get(term_id, (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32)))
+            self.delta_postings[term_id] = np.append(docs, doc_id), np.append(tfs, np.int32(tf))
+        length = sum(counts.values())
+        key = normalize_name(name)
+        self.delta = self.delta + (DeltaDoc(key, name, text, counts, length),)
+        self.delta_keys[key] = doc_id
+        self.delta_lengths = np.append(self.delta_lengths, np.int32(length))
+        self.num_docs += 1
+        self.total_length += length
+
+    def apply(self, update: dict) -> "GuestSnapshot":
+        """A new snapshot with one update applied; see guest_search.GuestSearchEngine.add_guest and friends.
+
+        Raises ValueError when adding a guest whose name is taken and KeyError when
+        updating or deleting one that does not exist; this snapshot is unchanged.
+        """
+        op = update["op"]
+        if op not in ("add", "update", "delete"):
+            raise ValueError(f"Unknown guest update {op!r}")
+        name = update["guest"]["name"] if op != "delete" else update["name"]
+        key = normalize_name(str(name))
+        if not key:
+            raise ValueError(f"Guest name {name!r} has no letters or digits")
+        doc_id = self.find(key)
+        if op == "add" and doc_id is not None:
+            raise ValueError(f"Guest {name!r} already exists")
+        if op != "add" and doc_id is None:
+            raise KeyError(f"No guest named {name!r}")
+        snapshot = self._copy()
+        if doc_id is not None:
+            snapshot._delete(doc_id)
+        if op != "delete":
+            snapshot._add(update["guest"])
+        return snapshot
+
+def read_update_log(path: str) -> List[dict]:
+    """The updates logged against the index at `path` since it was written, in order."""
+    try:
+        with open(os.path.join(path, UPDATE_LOG), encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        return []
+    updates = []
+    for line in lines:
+        try:
+            updates.append(json.loads(line))
+        except json.JSONDecodeError:
+            # Torn by a crash mid-append, so the update was never acknowledged.
+            logging.warning(f"Ignoring a partial line in {os.path.join(path, UPDATE_LOG)}")
+    return updates
+
+def append_update_log(path: str, updates: List[dict]) -> None:
+    """Appends updates to the log of the index at `path`, durably, before they are served."""
+    if not updates:
+        return
+    with open(os.path.join(path, UPDATE_LOG), "a+b") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell():
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                # Start after a line torn by an earlier crash rather than extend it.
+                f.write(b"\n")
+        for update in updates:
+            f.write((json.dumps(update, ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
@@ -0,0 +1,93 @@
+import os
+import time
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) seconds, applied whenever a caller does not pass its own timeout.
+default_timeout = (
+    float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")),
+    float(os.getenv("HTTP_READ_TIMEOUT", "30")),
+)
+pool_maxsize = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+
+class HostStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "mean_ms": round(1000 * self.total_seconds / self.requests, 1) if self.requests else 0.0,
+            "max_ms": round(1000 * self.max_seconds, 1),
+        }
+
+class PooledSession(requests.Session):
+    """requests.Session with per-host keep-alive pools, retries, default timeouts and latency stats."""
+
+    def __init__(self):
+        super().__init__()
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            respect_retry_after_header=True,
+            raise_on_status=False,  # Hand the last response back so callers' raise_for_status still applies.
+        )
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self._stats: Dict[str, HostStats] = defaultdict(HostStats)
+        self._stats_lock = threading.Lock()
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault("timeout", default_timeout)
+        host = urlsplit(url).netloc
+        start = time.monotonic()
+        failed = True
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            failed = response.status_code >= 400
+            return response
+        finally:
+            elapsed = time.monotonic() - start
+            with self._stats_lock:
+                stats = self._stats[host]
+                stats.requests += 1
+                stats.errors += failed
+                stats.total_seconds += elapsed
+                stats.max_seconds = max(stats.max_seconds, elapsed)
+
+    def latency_stats(self) -> Dict[str, dict]:
+        with self._stats_lock:
+            return {host: stats.as_dict() for host, stats in self._stats.items()}
+
+_session: PooledSession | None = None
+_session_lock = threading.Lock()
+
+def get_session() -> PooledSession:
+    """Returns the process-wide pooled session shared by every outbound HTTP call."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = PooledSession()
+        return _session
+
+def get(url, **kwargs) -> requests.Response:
+    return get_session().get(url, **kwargs)
+
+def post(url, **kwargs) -> requests.Response:
+    return get_session().post(url, **kwargs)
+
+def log_latency_stats() -> None:
+    for host, stats in sorted(get_session().latency_stats().items()):
+        logging.info(f"[HTTP] {host}: {stats}")
@@ -1,22 +1,30 @@
 import os
 import logging
-from langfuse.callback import CallbackHandler
 from typing import Optional
 
-_langfuse_handler: Optional[CallbackHandler] = None
+_langfuse_handler = None
+_warned = False
 
-def get_langfuse_handler() -> CallbackHandler:
-    global _langfuse_handler
+def get_langfuse_handler() -> Optional["CallbackHandler"]:
+    """Returns the shared Langfuse callback handler, or None when the keys are not configured."""
+    global _langfuse_handler, _warned
     if _langfuse_handler is None:
         public_key = os.environ.get("LANGFUSE_PUBLIC_KEY")
         secret_key = os.environ.get("LANGFUSE_SECRET_KEY")
         if not public_key or not secret_key:
-            raise ValueError("Langfuse public key or secret key not found in environment variables.")
+            if not _warned:
+                logging.warning("Langfuse public key or secret key not found in environment variables; tracing disabled.")
+                _warned = True
+            return None
+        from langfuse.callback import CallbackHandler
+        # Events are queued and sent in batches by Langfuse's background threads, never on the agent's step;
+        # TRACE_SAMPLE_RATE keeps only a fraction of traces, decided per trace.
         _langfuse_handler = CallbackHandler(
             secret_key=secret_key,
             public_key=public_key,
-            host="https://cloud.langfuse.com"
+            host=os.environ.get("LANGFUSE_HOST", "https://cloud.langfuse.com"),
+            sample_rate=float(os.environ.get("TRACE_SAMPLE_RATE", "1.0")),
+            flush_at=int(os.environ.get("TRACE_BATCH_SIZE", "256")),
+            flush_interval=float(os.environ.get("TRACE_EXPORT_INTERVAL", "5")),
         )
-    return _langfuse_handler
-
-langfuse_handler = get_langfuse_handler()
\ No newline at end of file
+    return _langfuse_handler
\ No newline at end of file
@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Optional
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable
+from .serialization import canonical_messages, decode, encode, request_key
+from . import metrics
+
+# AGENT_LLM_CACHE: "readwrite" (default), "readonly" to serve hits without storing new
+# responses, or "bypass" to always call the model.
+llm_cache_mode = os.getenv("AGENT_LLM_CACHE", "readwrite").lower()
+llm_cache_path = os.getenv(
+    "AGENT_LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "checkpoints", "llm_cache.sqlite")
+)
+max_llm_cache_entries = int(os.getenv("AGENT_LLM_CACHE_MAX_ENTRIES", "2000"))
+
+class LLMCache:
+    """SQLite store of model responses keyed by model, tool schemas and canonical messages.
+
+    Rows are evicted least recently used first once `max_entries` is exceeded.
+    """
+
+    def __init__(self, path: str = llm_cache_path, max_entries: int = max_llm_cache_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, model TEXT, accessed_at REAL, response TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._db.execute("SELECT response FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        # Decoded fresh on every hit, since the assistant node mutates the message it gets back.
+        return decode(json.loads(row[0]))
+
+    def put(self, key: str, model: str, response: Any) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?)",
+                (key, model, time.time(), json.dumps(encode(response), ensure_ascii=False)),
+            )
+            self._db.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Returns the process-wide response cache, or None in bypass mode."""
+    global _cache
+    if llm_cache_mode not in ("readwrite", "readonly"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
+
+class CachedRunnable(Runnable):
+    """Serves a chat model's responses from the LLM cache when the exact same request was seen before."""
+
+    def __init__(self, runnable: Runnable, name: str, tool_schemas: Any = None):
+        self.runnable = runnable
+        self.name = name
+        self.tool_schemas = tool_schemas
+
+    def invoke(self, input, config=None, **kwargs):
+        cache = get_llm_cache()
+        if cache is None:
+            return self.runnable.invoke(input, config, **kwargs)
+        key = request_key("llm", self.name, {"tools": self.tool_schemas, "messages": canonical_messages(input)})
+        response = cache.get(key)
+        metrics.observe_cache("llm", response is not None)
+        if response is not None:
+            logging.debug(f"[CACHE] {self.name} response hit {key[:12]}")
+            if isinstance(response, BaseMessage):
+                response.response_metadata = {**(response.response_metadata or {}), "cached": True}
+            return response
+        response = self.runnable.invoke(input, config, **kwargs)
+        if llm_cache_mode == "readwrite":
+            cache.put(key, self.name, response)
+        return response
+
+def log_cache_stats() -> None:
+    cache = get_llm_cache()
+    if cache is not None:
+        logging.info(f"[CACHE] llm: {cache.stats()}")
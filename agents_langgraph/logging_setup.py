@@ -0,0 +1,76 @@
+import os
+import json
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any
+
+max_message_chars = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000"))
+max_file_bytes = int(os.getenv("LOG_MAX_FILE_BYTES", str(10 * 1024 * 1024)))
+backup_count = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+queue_size = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+_listener: QueueListener | None = None
+
+def truncate(text: str, limit: int = max_message_chars) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [truncated {len(text) - limit} chars]"
+
+class TruncatingQueueHandler(QueueHandler):
+    """Queues records for the background listener, truncating oversized messages first.
+
+    Records are rendered to a plain string here, on the caller's thread, so only
+    a bounded amount of text is kept; when the queue is full the record is dropped
+    rather than blocking the agent.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        record.msg = truncate(record.msg)
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+def configure_logging(log_dir: str, level: str | int = "DEBUG", file_name: str = "agent_debug.log") -> str:
+    """Routes the root logger through a bounded queue to a rotating file and the console.
+
+    Returns the path of the active log file. Safe to call more than once.
+    """
+    global _listener
+    os.makedirs(log_dir, exist_ok=True)
+    log_file = os.path.join(log_dir, file_name)
+    if _listener is not None:
+        return log_file
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+    file_handler = RotatingFileHandler(log_file, maxBytes=max_file_bytes, backupCount=backup_count, encoding='utf-8')
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    _listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(TruncatingQueueHandler(log_queue))
+    root.setLevel(level)
+    return log_file
+
+def log_event(event: str, level: int = logging.INFO, **fields: Any) -> None:
+    """Logs one structured event as a JSON object, truncating large string fields."""
+    logger = logging.getLogger()
+    if not logger.isEnabledFor(level):
+        return
+    payload = {"event": event}
+    for key, value in fields.items():
+        if not isinstance(value, (int, float, bool, type(None))):
+            value = truncate(value if isinstance(value, str) else repr(value))
+        payload[key] = value
+    logger.log(level, json.dumps(payload, ensure_ascii=False))
@@ -0,0 +1,173 @@
+import os
+import time
+import inspect
+import tempfile
+import functools
+import threading
+import contextvars
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+metrics_file = os.getenv(
+    "AGENT_METRICS_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs", "metrics.prom")
+)
+
+def _label_text(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{key}="{str(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[tuple, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1.0, **labels) -> None:
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(labels)} {value:g}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._counts: Dict[tuple, list] = {}
+        self._sums: Dict[tuple, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._sums[key] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, counts in sorted(self._counts.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), counts):
+                    cumulative += count
+                    le = f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_label_text(labels, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(labels)} {self._sums[labels]:.4f}")
+                lines.append(f"{self.name}_count{_label_text(labels)} {cumulative}")
+        return lines
+
+NODE_SECONDS = Histogram("agent_node_seconds", "Wall time of each react_graph node run.")
+TOOL_SECONDS = Histogram("agent_tool_seconds", "Wall time of each tool call, cache hits included.")
+LLM_SECONDS = Histogram("agent_llm_seconds", "Wall time of each assistant model call.")
+LLM_TOKENS = Counter("agent_llm_tokens_total", "Tokens reported by the model, by direction.")
+SLEEP_SECONDS = Counter("agent_sleep_seconds_total", "Seconds spent in deliberate waits: throttling and backoff.")
+CACHE_REQUESTS = Counter("agent_cache_requests_total", "Cache lookups by cache and result.")
+QUESTION_SECONDS = Histogram("agent_question_seconds", "End-to-end time per question.")
+ALL_METRICS = (NODE_SECONDS, TOOL_SECONDS, LLM_SECONDS, LLM_TOKENS, SLEEP_SECONDS, CACHE_REQUESTS, QUESTION_SECONDS)
+
+@dataclass
+class QuestionMetrics:
+    """Running totals for the question being answered on the current context."""
+    llm_calls: int = 0
+    llm_seconds: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    tool_calls: int = 0
+    tool_seconds: float = 0.0
+    sleep_seconds: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+    def as_dict(self) -> dict:
+        return {key: round(value, 2) if isinstance(value, float) else value for key, value in asdict(self).items()}
+
+_question: contextvars.ContextVar[Optional[QuestionMetrics]] = contextvars.ContextVar("question_metrics", default=None)
+_totals_lock = threading.Lock()
+
+def start_question() -> QuestionMetrics:
+    """Starts per-question totals; tools and nodes running in copies of this context add to them."""
+    totals = QuestionMetrics()
+    _question.set(totals)
+    return totals
+
+def _add(**amounts) -> None:
+    totals = _question.get()
+    if totals is None:
+        return
+    with _totals_lock:
+        for key, value in amounts.items():
+            setattr(totals, key, getattr(totals, key) + value)
+
+def timed_node(name: str, node: Callable) -> Callable:
+    """Wraps a graph node so each run is recorded in NODE_SECONDS."""
+    takes_config = "config" in inspect.signature(node).parameters
+
+    @functools.wraps(node)
+    def wrapper(state, config):
+        start = time.monotonic()
+        try:
+            return node(state, config) if takes_config else node(state)
+        finally:
+            NODE_SECONDS.observe(time.monotonic() - start, node=name)
+    wrapper.__signature__ = inspect.Signature([
+        inspect.Parameter("state", inspect.Parameter.POSITIONAL_OR_KEYWORD),
+        inspect.Parameter("config", inspect.Parameter.POSITIONAL_OR_KEYWORD),
+    ])
+    return wrapper
+
+def observe_tool(name: str, seconds: float, ok: bool = True) -> None:
+    TOOL_SECONDS.observe(seconds, tool=name, status="ok" if ok else "error")
+    _add(tool_calls=1, tool_seconds=seconds)
+
+def observe_llm(model: str, seconds: float, usage: Optional[dict], cached: bool = False) -> None:
+    LLM_SECONDS.observe(seconds, model=model, cached=str(cached).lower())
+    input_tokens = output_tokens = 0
+    if usage and not cached:
+        input_tokens = usage.get("input_tokens") or 0
+        output_tokens = usage.get("output_tokens") or 0
+        LLM_TOKENS.inc(input_tokens, model=model, kind="input")
+        LLM_TOKENS.inc(output_tokens, model=model, kind="output")
+    _add(llm_calls=1, llm_seconds=seconds, input_tokens=input_tokens, output_tokens=output_tokens)
+
+def observe_sleep(provider: str, reason: str, seconds: float) -> None:
+    SLEEP_SECONDS.inc(seconds, provider=provider, reason=reason)
+    _add(sleep_seconds=seconds)
+
+def observe_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+    if hit:
+        _add(cache_hits=1)
+    else:
+        _add(cache_misses=1)
+
+def observe_question(seconds: float, status: str) -> None:
+    QUESTION_SECONDS.observe(seconds, status=status)
+
+def render() -> str:
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path: str = metrics_file) -> str:
+    """Writes every metric in Prometheus text format, atomically, for a node-exporter textfile collector."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".prom.tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,100 @@
+import os
+import time
+import logging
+from typing import List, Optional
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import Runnable
+
+# AGENT_MODEL_POLICY: "cascade" (default) sends routine steps to the cheap model and
+# escalates final answers and retries after a failed step; "cheap" or "strong" pin one model.
+model_policy = os.getenv("AGENT_MODEL_POLICY", "cascade").lower()
+cheap_model_name = os.getenv("AGENT_CHEAP_MODEL", "gemini-2.0-flash-lite")
+strong_model_name = os.getenv("AGENT_STRONG_MODEL", "gemini-2.0-flash")
+
+def is_final_answer(message) -> bool:
+    return isinstance(message, AIMessage) and not message.tool_calls and "final answer" in str(message.content).lower()
+
+def after_failure(messages) -> bool:
+    """True if the step follows a failed tool call or a turn that neither called a tool nor answered."""
+    if not messages:
+        return False
+    last = messages[-1]
+    if isinstance(last, ToolMessage):
+        return getattr(last, "status", "success") == "error"
+    # A HumanMessage after the first AI turn is the assistant node's nudge to continue.
+    return isinstance(last, HumanMessage) and any(isinstance(m, AIMessage) for m in messages)
+
+class ModelCascade(Runnable):
+    """Routes each assistant step to the cheap or the strong model.
+
+    Under the cascade policy the cheap model plans and picks tool calls; the strong
+    model is used after a failed step, when the cheap one errors, and to write the
+    final answer. The model that produced a reply is recorded in its response_metadata,
+    and so is every model call the step made ("cascade_calls": model, elapsed seconds,
+    usage and whether the cache answered it), since an escalated step makes two.
+    """
+
+    def __init__(self, cheap: Runnable, strong: Runnable, policy: str = model_policy,
+                 cheap_name: str = cheap_model_name, strong_name: str = strong_model_name):
+        self.cheap = cheap
+        self.strong = strong
+        self.policy = policy
+        self.cheap_name = cheap_name
+        self.strong_name = strong_name
+
+    def _call(self, name: str, runnable: Runnable, input, config, reason: str, calls: List[dict], **kwargs) -> AIMessage:
+        logging.debug(f"[ROUTER] {name} handles this step ({reason})")
+        start = time.monotonic()
+        try:
+            result = runnable.invoke(input, config, **kwargs)
+        except Exception:
+            calls.append({"model": name, "elapsed": time.monotonic() - start, "usage": None, "cached": False})
+            raise
+        metadata = getattr(result, "response_metadata", None) or {}
+        calls.append({
+            "model": name,
+            "elapsed": time.monotonic() - start,
+            "usage": getattr(result, "usage_metadata", None),
+            "cached": bool(metadata.get("cached")),
+        })
+        if isinstance(result, AIMessage):
+            result.response_metadata = {**metadata, "routed_model": name, "route_reason": reason, "cascade_calls": calls}
+        return result
+
+    def invoke(self, input, config=None, **kwargs):
+        calls: List[dict] = []
+        if self.policy == "strong":
+            return self._call(self.strong_name, self.strong, input, config, "policy", calls, **kwargs)
+        if self.policy == "cheap":
+            return self._call(self.cheap_name, self.cheap, input, config, "policy", calls, **kwargs)
+        if after_failure(input):
+            return self._call(self.strong_name, self.strong, input, config, "after_failure", calls, **kwargs)
+        try:
+            result = self._call(self.cheap_name, self.cheap, input, config, "routine", calls, **kwargs)
+        except Exception as e:
+            logging.warning(f"[ROUTER] {self.cheap_name} failed ({e}); escalating to {self.strong_name}")
+            return self._call(self.strong_name, self.strong, input, config, "cheap_error", calls, **kwargs)
+        if is_final_answer(result):
+            # The cheap reply is discarded, but its call still counts (see cascade_calls).
+            return self._call(self.strong_name, self.strong, input, config, "final_answer", calls, **kwargs)
+        return result
+
+def routed_model(message) -> Optional[str]:
+    return (getattr(message, "response_metadata", None) or {}).get("routed_model")
+
+def cascade_calls(message, elapsed: float) -> List[dict]:
+    """The model calls behind a reply; a reply from outside the cascade counts as one call taking `elapsed`."""
+    metadata = getattr(message, "response_metadata", None) or {}
+    calls = metadata.get("cascade_calls")
+    if calls:
+        return calls
+    return [{
+        "model": routed_model(message),
+        "elapsed": elapsed,
+        "usage": getattr(message, "usage_metadata", None),
+        "cached": bool(metadata.get("cached")),
+    }]
+
+def limiter_provider(model_name: str) -> str:
+    """Rate limiter key for a model: the strong model keeps the "gemini" quota, the cheap one has its own."""
+    return "gemini" if model_name == strong_model_name else "gemini_cheap"
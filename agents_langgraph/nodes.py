@@ -1,10 +1,58 @@
+import time
 import logging
-from langchain_core.messages import SystemMessage, AIMessage, HumanMessage
+from langchain_core.messages import SystemMessage, AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import END
 from .agent_state import AgentState
-from .utils import agent_runnable
-import time
+from .budget import get_budget
+from .utils import get_agent_runnable
+from .model_router import cascade_calls
+from . import metrics
+
+CONTINUE_PROMPT = "Continue: call a tool if you need more information, otherwise give your FINAL ANSWER."
+
+def best_partial_answer(messages, max_chars: int = 500) -> str:
+    """The answer to return when the step budget runs out before a FINAL ANSWER.
 
-def assistant(state: AgentState) -> AgentState:
+    Prefers the latest assistant reply, then the latest assistant text written
+    alongside tool calls, then the start of the latest tool result, so a run
+    that only called tools still returns what it found.
+    """
+    ai_texts = [
+        (bool(msg.tool_calls), str(msg.content).strip())
+        for msg in messages if isinstance(msg, AIMessage)
+    ]
+    for with_tools in (False, True):
+        for has_tool_calls, content in reversed(ai_texts):
+            if has_tool_calls == with_tools and content and content != "No content":
+                return content.replace("\n", " ")
+    for msg in reversed(messages):
+        if isinstance(msg, ToolMessage):
+            content = " ".join(str(msg.content).split())
+            if content:
+                return content[:max_chars]
+    return ""
+
+def budget_exhausted(state: AgentState, budget) -> str | None:
+    if state.get("llm_calls", 0) >= budget.max_llm_calls:
+        return "max_llm_calls"
+    if state.get("tool_calls", 0) > budget.max_tool_calls:
+        return "max_tool_calls"
+    if time.time() - state.get("started_at", time.time()) >= budget.max_seconds:
+        return "max_seconds"
+    return None
+
+def assistant(state: AgentState, config: RunnableConfig) -> AgentState:
+    budget = get_budget(config)
+    if not state.get("started_at"):
+        state["started_at"] = time.time()
+        state["llm_calls"] = 0
+        state["tool_calls"] = 0
+        state["model_calls"] = {}
+        state["stop_reason"] = None
+    if state.get("messages") and isinstance(state["messages"][-1], AIMessage) and not state["messages"][-1].tool_calls:
+        # The previous turn neither called a tool nor answered; nudge instead of resending the same prompt.
+        state["messages"].append(HumanMessage(content=CONTINUE_PROMPT))
     if not state.get('messages'):
         tools_desc = (
             "duckduckgo_search(query: str) -> str: Performs a web search using DuckDuckGo to find information on the internet.\n"
@@ -13,6 +61,7 @@ def assistant(state: AgentState) -> AgentState:
             "serpapi_search(query: str) -> str: Performs a web search using SerpAPI to retrieve information from Google and other sources.\n"
             "requests_get(url: str) -> str: Fetches the main content of a web page by URL.\n"
             "youtube_search(query: str) -> str: Searches YouTube for videos related to the query.\n"
+            "read_attachment(path: str) -> str: Reads the file attached to the question (text, CSV or Excel) from its local path.\n"
         )
         sys_prompt = (
             "You are a general AI assistant. I will ask you a question.\n"
@@ -41,15 +90,28 @@ def assistant(state: AgentState) -> AgentState:
         )
         state["messages"] = [SystemMessage(content=sys_prompt)]
         if "question" in state and state["question"]:
-            state["messages"].append(HumanMessage(content=state["question"]))
+            question = state["question"]
+            if state.get("file_path"):
+                question += (f"\n\nThe file attached to this question is stored locally at: {state['file_path']}"
+                             "\nRead it with read_attachment.")
+            state["messages"].append(HumanMessage(content=question))
     if state["messages"]:
         last_msg = state["messages"][-1]
         if isinstance(last_msg, HumanMessage):
             logging.debug(f"Latest HumanMessage: {last_msg.content}")
         elif isinstance(last_msg, SystemMessage):
             logging.debug("System prompt sent.")
-    result = agent_runnable.invoke(state["messages"])
-    time.sleep(4)
+    llm_start = time.monotonic()
+    result = get_agent_runnable().invoke(state["messages"])
+    # An escalated step calls both models; each call is charged to the budget and the metrics.
+    calls = cascade_calls(result, time.monotonic() - llm_start)
+    model_calls = dict(state.get("model_calls") or {})
+    for call in calls:
+        metrics.observe_llm(call["model"] or "unknown", call["elapsed"], call["usage"], cached=call["cached"])
+        if call["model"]:
+            model_calls[call["model"]] = model_calls.get(call["model"], 0) + 1
+    state["llm_calls"] = state.get("llm_calls", 0) + len(calls)
+    state["model_calls"] = model_calls
     if isinstance(result, AIMessage):
         msg_type = getattr(result, "type", "AIMessage")
         content = getattr(result, "content", "No content")
@@ -73,5 +135,21 @@ def assistant(state: AgentState) -> AgentState:
         else:
             result.type = "intermediate"
             state["final_answer"] = None
+            state["tool_calls"] = state.get("tool_calls", 0) + len(result.tool_calls)
     state["messages"].append(result)
-    return state
\ No newline at end of file
+    if state.get("final_answer") is None:
+        stop_reason = budget_exhausted(state, budget)
+        if stop_reason:
+            state["stop_reason"] = stop_reason
+            state["final_answer"] = best_partial_answer(state["messages"])
+            logging.warning(f"Step budget exhausted ({stop_reason}); returning partial answer: {state['final_answer']}")
+    return state
+
+def route_after_assistant(state: AgentState) -> str:
+    """Ends the run once an answer exists, otherwise executes pending tool calls or asks again."""
+    if state.get("final_answer") is not None:
+        return END
+    last_msg = state["messages"][-1]
+    if isinstance(last_msg, AIMessage) and last_msg.tool_calls:
+        return "tools"
+    return "assistant"
\ No newline at end of file
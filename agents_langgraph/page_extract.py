@@ -0,0 +1,133 @@
+import os
+import re
+import logging
+from html.parser import HTMLParser
+from typing import List
+from .guest_index import tokenize
+from .tool_executor import current_question
+
+page_top_k = int(os.getenv("AGENT_PAGE_TOP_K", "6"))
+page_max_chars = int(os.getenv("AGENT_PAGE_MAX_CHARS", "8000"))
+chunk_chars = int(os.getenv("AGENT_PAGE_CHUNK_CHARS", "1000"))
+max_extracted_chars = int(os.getenv("AGENT_PAGE_MAX_EXTRACTED_CHARS", str(2 * 1024 * 1024)))
+
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "canvas", "iframe", "head",
+             "nav", "header", "footer", "aside", "button", "select"}
+BLOCK_TAGS = {"p", "div", "section", "article", "main", "br", "li", "ul", "ol", "table", "tr",
+              "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "dd", "dt", "figcaption", "caption"}
+
+class MainTextParser(HTMLParser):
+    """Collects visible text blocks, dropping scripts, styles and navigation chrome.
+
+    Fed incrementally; once `max_chars` of text are collected the rest of the page is ignored.
+    """
+
+    def __init__(self, max_chars: int = max_extracted_chars):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.blocks: List[str] = []
+        self._current: List[str] = []
+        self._skip_depth = 0
+        self._chars = 0
+
+    @property
+    def full(self) -> bool:
+        return self._chars >= self.max_chars
+
+    def _flush(self) -> None:
+        text = " ".join("".join(self._current).split())
+        self._current = []
+        if text:
+            self.blocks.append(text)
+            self._chars += len(text)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self._flush()
+        elif tag in ("td", "th"):
+            self._current.append(" | ")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data):
+        if not self._skip_depth and not self.full:
+            self._current.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+def looks_like_html(text: str) -> bool:
+    head = text[:2000].lower()
+    return "<html" in head or "<!doctype html" in head or "<body" in head or "<div" in head
+
+def extract_main_text(text: str, feed_chars: int = 1 << 16) -> str:
+    """Strips markup from an HTML page and returns its text blocks separated by blank lines."""
+    if not isinstance(text, str) or not looks_like_html(text):
+        return text
+    parser = MainTextParser()
+    for start in range(0, len(text), feed_chars):
+        parser.feed(text[start:start + feed_chars])
+        if parser.full:
+            break
+    parser.close()
+    return "\n\n".join(parser.blocks)
+
+def split_chunks(text: str, size: int = chunk_chars) -> List[str]:
+    """Packs consecutive paragraphs into chunks of about `size` characters, splitting oversized ones."""
+    chunks, current = [], ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        while len(paragraph) > size:
+            if current:
+                chunks.append(current)
+                current = ""
+            cut = paragraph.rfind(" ", 0, size)
+            cut = cut if cut > size // 2 else size
+            chunks.append(paragraph[:cut])
+            paragraph = paragraph[cut:].strip()
+        if current and len(current) + len(paragraph) + 2 > size:
+            chunks.append(current)
+            current = ""
+        if paragraph:
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+def rank_chunks(text: str, query: str, top_k: int = page_top_k, max_chars: int = page_max_chars) -> str:
+    """Returns the chunks of `text` most relevant to `query` under BM25, in page order, within `max_chars`."""
+    if len(text) <= max_chars:
+        return text
+    chunks = split_chunks(text)
+    query_tokens = tokenize(query or "")
+    if query_tokens:
+        from rank_bm25 import BM25Okapi
+        scores = BM25Okapi([tokenize(chunk) or [""] for chunk in chunks]).get_scores(query_tokens)
+        order = sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True)
+    else:
+        order = list(range(len(chunks)))
+    selected, used = [], 0
+    for i in order:
+        if len(selected) >= top_k:
+            break
+        if used + len(chunks[i]) > max_chars:
+            continue
+        selected.append(i)
+        used += len(chunks[i])
+    selected.sort()
+    logging.debug(f"Kept {len(selected)} of {len(chunks)} page chunks ({used} of {len(text)} chars)")
+    header = f"[Showing the {len(selected)} of {len(chunks)} passages most relevant to the question]"
+    return "\n\n...\n\n".join([header] + [chunks[i] for i in selected])
+
+def relevant_page_text(page: str) -> str:
+    """Post-processes fetched page text for the conversation, ranking it against the current question."""
+    if not isinstance(page, str):
+        return page
+    return rank_chunks(page, current_question.get())
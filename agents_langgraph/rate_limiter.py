@@ -0,0 +1,250 @@
+import os
+import re
+import time
+import random
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict
+from langchain_core.runnables import Runnable
+from . import metrics
+
+# Requests per minute allowed for each upstream, overridable with RATE_LIMIT_<PROVIDER>_RPM.
+DEFAULT_RPM: Dict[str, float] = {
+    "gemini": 15,
+    "gemini_cheap": 30,
+    "tavily": 60,
+    "serpapi": 30,
+    "duckduckgo": 20,
+}
+# Tokens per minute for model upstreams, overridable with RATE_LIMIT_<PROVIDER>_TPM.
+DEFAULT_TPM: Dict[str, float] = {
+    "gemini": 1_000_000,
+    "gemini_cheap": 1_000_000,
+}
+max_retries = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "5"))
+backoff_base_seconds = float(os.getenv("RATE_LIMIT_BACKOFF_BASE", "2"))
+backoff_max_seconds = float(os.getenv("RATE_LIMIT_BACKOFF_MAX", "60"))
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every worker talking to one upstream."""
+
+    def __init__(self, name: str, rate_per_minute: float, capacity: int | None = None):
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else max(1, int(rate_per_minute // 4)))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Blocks until `tokens` are available and returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    if waited:
+                        self.waited_seconds += waited
+                        logging.debug(f"[RATE] {self.name} waited {waited:.2f}s")
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            metrics.observe_sleep(self.name, "throttle", delay)
+            waited += delay
+
+# Only for errors that carry no status code: a 429 that reads as a status, not any "429" in the text.
+_rate_limit_text = re.compile(
+    r"RESOURCE_EXHAUSTED|too many requests|rate.?limit|(?:status|code|error|http)\W{0,3}429\b|^\s*429\b",
+    re.IGNORECASE,
+)
+
+def _status_code(error: BaseException) -> int | None:
+    for value in (getattr(error, "status_code", None), getattr(error, "code", None),
+                  getattr(getattr(error, "response", None), "status_code", None)):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+    return None
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """True for provider rate-limit errors, judged by type or HTTP status, and by message only as a last resort.
+
+    Wrapped errors (a client exception raised from the provider's) are judged by the whole cause chain.
+    """
+    chain = []
+    while error is not None and error not in chain:
+        chain.append(error)
+        error = error.__cause__ or error.__context__
+    statuses = [_status_code(e) for e in chain]
+    if any(type(e).__name__ in ("ResourceExhausted", "RateLimitError", "TooManyRequests") for e in chain):
+        return True
+    if any(status is not None for status in statuses):
+        return 429 in statuses
+    return any(_rate_limit_text.search(str(e)) for e in chain)
+
+def estimate_tokens(messages) -> int:
+    """Rough prompt size (about four characters per token), used before the real usage is known."""
+    return sum(len(str(getattr(m, "content", m))) for m in messages) // 4 + 1
+
+class ModelRateLimiter:
+    """Keeps a model's calls within its requests- and tokens-per-minute quota.
+
+    Calls are only delayed when the trailing one-minute window is full. Rate-limit
+    errors trigger jittered exponential backoff that also pauses every other
+    caller of the same model, and all waiting is accounted for in `stats()`.
+    """
+
+    def __init__(self, name: str, rpm: float, tpm: float, window: float = 60.0):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self._events: deque = deque()  # [timestamp, tokens] for calls inside the window
+        self._tokens = 0
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.rate_limit_errors = 0
+        self.waited_seconds = 0.0
+        self.backoff_seconds = 0.0
+
+    def _prune(self, now: float) -> None:
+        while self._events and self._events[0][0] <= now - self.window:
+            self._tokens -= self._events.popleft()[1]
+
+    def _delay(self, now: float, tokens: int) -> float:
+        delay = max(0.0, self._blocked_until - now)
+        if len(self._events) >= self.rpm:
+            delay = max(delay, self._events[0][0] + self.window - now)
+        if self._events and self._tokens + tokens > self.tpm:
+            freed = self._tokens
+            for timestamp, event_tokens in self._events:
+                freed -= event_tokens
+                if freed + tokens <= self.tpm:
+                    delay = max(delay, timestamp + self.window - now)
+                    break
+        return delay
+
+    def acquire(self, tokens: int) -> list:
+        """Blocks until the call fits in the window and returns its event for later usage correction."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._prune(now)
+                delay = self._delay(now, tokens)
+                if delay <= 0:
+                    event = [now, tokens]
+                    self._events.append(event)
+                    self._tokens += tokens
+                    self.requests += 1
+                    return event
+                self.waited_seconds += delay
+            logging.debug(f"[RATE] {self.name} window full, waiting {delay:.2f}s")
+            time.sleep(delay)
+            metrics.observe_sleep(self.name, "throttle", delay)
+
+    def record_usage(self, event: list, tokens: int) -> None:
+        with self._lock:
+            if any(e is event for e in self._events):
+                self._tokens += tokens - event[1]
+            event[1] = tokens
+
+    def backoff(self, attempt: int) -> float:
+        delay = random.uniform(0.5, 1.0) * min(backoff_max_seconds, backoff_base_seconds * 2 ** attempt)
+        with self._lock:
+            self.rate_limit_errors += 1
+            self.backoff_seconds += delay
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        return delay
+
+    def call(self, func: Callable[[], Any], estimated_tokens: int,
+             usage: Callable[[Any], int | None] = lambda result: None) -> Any:
+        for attempt in range(max_retries + 1):
+            event = self.acquire(estimated_tokens)
+            try:
+                result = func()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                logging.warning(f"[RATE] {self.name} rate limited ({e}); backing off {delay:.1f}s (attempt {attempt + 1}/{max_retries})")
+                time.sleep(delay)
+                metrics.observe_sleep(self.name, "backoff", delay)
+                continue
+            actual = usage(result)
+            if actual:
+                self.record_usage(event, actual)
+            return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "rate_limit_errors": self.rate_limit_errors,
+                "waited_seconds": round(self.waited_seconds, 2),
+                "backoff_seconds": round(self.backoff_seconds, 2),
+            }
+
+_limiters: Dict[str, TokenBucket] = {}
+_model_limiters: Dict[str, ModelRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(provider: str) -> TokenBucket:
+    """Returns the process-wide limiter for `provider`, creating it on first use."""
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            rpm = float(os.getenv(f"RATE_LIMIT_{provider.upper()}_RPM", DEFAULT_RPM.get(provider, 60)))
+            limiter = TokenBucket(provider, rpm)
+            _limiters[provider] = limiter
+        return limiter
+
+def get_model_limiter(provider: str) -> ModelRateLimiter:
+    """Returns the process-wide requests/tokens-per-minute limiter for a model provider."""
+    with _limiters_lock:
+        limiter = _model_limiters.get(provider)
+        if limiter is None:
+            rpm = float(os.getenv(f"RATE_LIMIT_{provider.upper()}_RPM", DEFAULT_RPM.get(provider, 60)))
+            tpm = float(os.getenv(f"RATE_LIMIT_{provider.upper()}_TPM", DEFAULT_TPM.get(provider, 1_000_000)))
+            limiter = ModelRateLimiter(provider, rpm, tpm)
+            _model_limiters[provider] = limiter
+        return limiter
+
+def wait_stats() -> Dict[str, dict]:
+    """Seconds spent waiting on each limiter so far, for logging and metrics."""
+    with _limiters_lock:
+        stats = {name: {"waited_seconds": round(b.waited_seconds, 2)} for name, b in _limiters.items()}
+        models = list(_model_limiters.values())
+    for limiter in models:
+        stats[limiter.name] = limiter.stats()
+    return stats
+
+def log_wait_stats() -> None:
+    for name, stats in sorted(wait_stats().items()):
+        logging.info(f"[RATE] {name}: {stats}")
+
+def acquire(provider: str | None) -> float:
+    if not provider:
+        return 0.0
+    return get_limiter(provider).acquire()
+
+class RateLimitedRunnable(Runnable):
+    """Sends a chat model's calls through its provider's ModelRateLimiter, correcting the token estimate with the reported usage."""
+
+    def __init__(self, runnable: Runnable, provider: str):
+        self.runnable = runnable
+        self.provider = provider
+
+    def invoke(self, input, config=None, **kwargs):
+        return get_model_limiter(self.provider).call(
+            lambda: self.runnable.invoke(input, config, **kwargs),
+            estimated_tokens=estimate_tokens(input),
+            usage=lambda r: (getattr(r, "usage_metadata", None) or {}).get("total_tokens"),
+        )
\ No newline at end of file
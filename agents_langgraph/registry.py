@@ -0,0 +1,78 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Optional
+
+class LazyRegistry:
+    """Builds named components (tools, model clients, graphs) on first use and caches them.
+
+    Each component has its own lock, so a factory may fetch other components and
+    concurrent first calls build a component only once.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.RLock] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        with self._lock:
+            self._factories[name] = factory
+            self._locks.setdefault(name, threading.RLock())
+
+    def get(self, name: str) -> Any:
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        if name not in self._factories:
+            raise KeyError(f"No component registered under '{name}'.")
+        with self._locks[name]:
+            if name not in self._instances:
+                start = time.monotonic()
+                self._instances[name] = self._factories[name]()
+                logging.info(f"[REGISTRY] Built {name} in {time.monotonic() - start:.2f}s")
+            return self._instances[name]
+
+    def is_built(self, name: str) -> bool:
+        return name in self._instances
+
+    def reset(self, name: Optional[str] = None) -> None:
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+    @contextmanager
+    def override(self, name: str, instance: Any):
+        """Temporarily replaces a component, e.g. with a stub in benchmarks."""
+        missing = object()
+        previous = self._instances.get(name, missing)
+        self._instances[name] = instance
+        try:
+            yield instance
+        finally:
+            if previous is missing:
+                self._instances.pop(name, None)
+            else:
+                self._instances[name] = previous
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> threading.Thread:
+        """Builds components on a background thread so the first request does not pay for them."""
+        names = list(names) if names is not None else list(self._factories)
+
+        def run():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    logging.error(f"[REGISTRY] Warm-up of {name} failed: {e}")
+
+        thread = threading.Thread(target=run, name="registry-warmup", daemon=True)
+        thread.start()
+        return thread
+
+registry = LazyRegistry()
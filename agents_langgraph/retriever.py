@@ -1,21 +1,28 @@
 import logging
-from langchain_community.retrievers import BM25Retriever
-from langchain.tools import Tool
-from .prepare_dataset import load_and_prepare_docs
-
-docs = load_and_prepare_docs()
-bm25_retriever = BM25Retriever.from_documents(docs)
+from typing import List
+from langchain.tools import StructuredTool, Tool
+from .guest_search import get_guest_search, format_batch, format_hits
 
 def retrieve_guest_info(query: str) -> str:
     """Retrieves detailed information about gala guests based on their name or relation."""
-    results = bm25_retriever.invoke(query)
-    if results:
-        return "\n\n".join([doc.page_content for doc in results[:3]])
-    else:
-        return "No matching guest information found."
+    hits = get_guest_search().search(query, k=3)
+    logging.debug(f"Guest retriever found {len(hits)} matches for {query!r} ({hits[0].match if hits else 'none'})")
+    return format_hits(hits)
     
 guest_info_retriever = Tool(
     name="retrieve_guest_info",
     func=retrieve_guest_info,
     description="Retrieves detailed information about gala guests based on their name or relation."
 )
+
+def retrieve_guests_info(queries: List[str]) -> str:
+    """Retrieves detailed information about several gala guests at once, one section per name or relation."""
+    results = get_guest_search().search_many(queries, k=3)
+    logging.debug(f"Guest retriever answered {len(queries)} queries in one batch")
+    return format_batch(queries, results)
+
+guests_info_retriever = StructuredTool.from_function(
+    func=retrieve_guests_info,
+    name="retrieve_guests_info",
+    description="Retrieves detailed information about several gala guests at once; pass a list of names or relations."
+)
\ No newline at end of file
@@ -0,0 +1,50 @@
+import functools
+from langchain_community.tools import DuckDuckGoSearchRun
+from langchain_community.tools.tavily_search import TavilySearchResults
+from langchain_community.tools.youtube.search import YouTubeSearchTool
+from langchain_community.utilities.tavily_search import TAVILY_API_URL, TavilySearchAPIWrapper
+from .utils import call_tool
+from . import http_client
+
+class PooledTavilySearchAPIWrapper(TavilySearchAPIWrapper):
+    """Sends Tavily searches through the pooled session, so they get its timeouts; the parent's requests.post has none."""
+
+    def raw_results(self, query: str, max_results: int | None = 5, search_depth: str | None = "advanced",
+                    include_domains=None, exclude_domains=None, include_answer: bool | None = False,
+                    include_raw_content: bool | None = False, include_images: bool | None = False) -> dict:
+        response = http_client.post(f"{TAVILY_API_URL}/search", json={
+            "api_key": self.tavily_api_key.get_secret_value(),
+            "query": query,
+            "max_results": max_results,
+            "search_depth": search_depth,
+            "include_domains": include_domains or [],
+            "exclude_domains": exclude_domains or [],
+            "include_answer": include_answer,
+            "include_raw_content": include_raw_content,
+            "include_images": include_images,
+        })
+        response.raise_for_status()
+        return response.json()
+
+class LoggingDuckDuckGoSearchRun(DuckDuckGoSearchRun):
+    def _run(self, query: str, run_manager=None):
+        return call_tool("duckduckgo_search", functools.partial(super()._run, run_manager=run_manager), query, provider="duckduckgo")
+
+class TavilySearchError(RuntimeError):
+    """A failed Tavily request, raised so it is neither cached nor recorded as a result."""
+
+class LoggingTavilySearchResults(TavilySearchResults):
+    def _search(self, query: str, run_manager=None):
+        result = super()._run(query, run_manager=run_manager)
+        # The parent catches every exception and returns (repr(error), {}) as if it were a result.
+        content, artifact = result
+        if isinstance(content, str) and not artifact:
+            raise TavilySearchError(content)
+        return result
+
+    def _run(self, query: str, run_manager=None):
+        return call_tool("tavily_search", functools.partial(self._search, run_manager=run_manager), query, provider="tavily")
+
+class LoggingYouTubeSearchTool(YouTubeSearchTool):
+    def _run(self, query: str, run_manager=None):
+        return call_tool("youtube_search", functools.partial(super()._run, run_manager=run_manager), query)
\ No newline at end of file
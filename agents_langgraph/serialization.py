@@ -0,0 +1,45 @@
+"""JSON encoding of model and tool responses, shared by the cassette and the LLM and tool caches."""
+import json
+import hashlib
+from typing import Any
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+
+def encode(value: Any) -> Any:
+    """A JSON-ready form of a response: messages and tuples are tagged so decode() restores them."""
+    if isinstance(value, BaseMessage):
+        return {"__message__": messages_to_dict([value])[0]}
+    if isinstance(value, tuple):
+        return {"__tuple__": [encode(v) for v in value]}
+    if isinstance(value, list):
+        return [encode(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): encode(v) for k, v in value.items()}
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+def decode(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "__message__" in value:
+            return messages_from_dict([value["__message__"]])[0]
+        if "__tuple__" in value:
+            return tuple(decode(v) for v in value["__tuple__"])
+        return {k: decode(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [decode(v) for v in value]
+    return value
+
+def canonical_messages(messages) -> list:
+    """Strips run-specific ids so identical conversations hash identically across runs."""
+    canonical = []
+    for msg in messages:
+        entry = {"type": msg.type, "content": msg.content}
+        tool_calls = getattr(msg, "tool_calls", None)
+        if tool_calls:
+            entry["tool_calls"] = [{"name": c["name"], "args": c["args"]} for c in tool_calls]
+        canonical.append(entry)
+    return canonical
+
+def request_key(kind: str, name: str, payload: Any) -> str:
+    blob = json.dumps([kind, name, encode(payload)], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from .serialization import decode, encode, request_key
+from . import metrics
+
+# Seconds a result stays fresh, keyed by the tool name passed to utils.call_tool and
+# overridable with AGENT_TOOL_CACHE_TTL_<NAME>. Tools not listed here are never cached.
+DEFAULT_TTL: Dict[str, float] = {
+    "duckduckgo_search": 24 * 3600,
+    "tavily_search": 7 * 24 * 3600,
+    "youtube_search": 7 * 24 * 3600,
+    "wikipedia": 7 * 24 * 3600,
+    "Search": 7 * 24 * 3600,  # serpapi, as named by load_tools
+    "requests_get": 24 * 3600,
+}
+cache_enabled = os.getenv("AGENT_TOOL_CACHE", "on").lower() not in ("0", "off", "false")
+cache_path = os.getenv(
+    "AGENT_TOOL_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "checkpoints", "tool_cache.sqlite")
+)
+max_disk_entries = int(os.getenv("AGENT_TOOL_CACHE_MAX_ENTRIES", "5000"))
+max_memory_entries = int(os.getenv("AGENT_TOOL_CACHE_MEMORY_ENTRIES", "256"))
+
+def tool_ttl(name: str) -> float:
+    return float(os.getenv(f"AGENT_TOOL_CACHE_TTL_{name.upper()}", DEFAULT_TTL.get(name, 0)))
+
+def normalize_url(url: str) -> str:
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", query, ""))
+
+def normalize_arg(value: Any) -> Any:
+    """Collapses whitespace and case in queries, and canonicalises URLs, so equivalent requests share a key."""
+    if isinstance(value, str):
+        text = " ".join(value.split())
+        if text.startswith(("http://", "https://")):
+            return normalize_url(text)
+        return text.lower()
+    if isinstance(value, dict):
+        return {k: normalize_arg(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_arg(v) for v in value]
+    return value
+
+class ToolCache:
+    """Tool results cache: an in-memory LRU in front of an SQLite table.
+
+    Entries expire after their tool's TTL; the table is bounded by evicting the
+    least recently used rows. Hits and misses are counted per tool.
+    """
+
+    def __init__(self, path: str = cache_path, max_entries: int = max_disk_entries,
+                 memory_entries: int = max_memory_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits: Dict[str, int] = defaultdict(int)
+        self.misses: Dict[str, int] = defaultdict(int)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tool_cache ("
+            "key TEXT PRIMARY KEY, tool TEXT, expires_at REAL, accessed_at REAL, value TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS tool_cache_accessed ON tool_cache (accessed_at)")
+        self._db.commit()
+
+    def _remember(self, key: str, expires_at: float, value: Any) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[0] > now:
+                self._memory.move_to_end(key)
+                return True, entry[1]
+            row = self._db.execute("SELECT expires_at, value FROM tool_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or row[0] <= now:
+                return False, None
+            self._db.execute("UPDATE tool_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            value = decode(json.loads(row[1]))
+            self._remember(key, row[0], value)
+            return True, value
+
+    def put(self, key: str, tool: str, value: Any, ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, now + ttl, value)
+            self._db.execute(
+                "INSERT OR REPLACE INTO tool_cache VALUES (?, ?, ?, ?, ?)",
+                (key, tool, now + ttl, now, json.dumps(encode(value), ensure_ascii=False)),
+            )
+            self._db.execute("DELETE FROM tool_cache WHERE expires_at <= ?", (now,))
+            self._db.execute(
+                "DELETE FROM tool_cache WHERE key IN ("
+                "SELECT key FROM tool_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+
+    def call(self, name: str, func: Callable, *args, **kwargs) -> Any:
+        """Returns the cached result for this call if it is fresh, otherwise runs `func` and stores the result."""
+        ttl = tool_ttl(name)
+        if ttl <= 0:
+            return func(*args, **kwargs)
+        key = request_key("tool_cache", name, {"args": normalize_arg(list(args)), "kwargs": normalize_arg(kwargs)})
+        found, value = self.get(key)
+        metrics.observe_cache("tool", found)
+        with self._lock:
+            if found:
+                self.hits[name] += 1
+            else:
+                self.misses[name] += 1
+        if found:
+            logging.debug(f"[CACHE] {name} hit {key[:12]}")
+            return value
+        value = func(*args, **kwargs)
+        self.put(key, name, value, ttl)
+        return value
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                name: {"hits": self.hits[name], "misses": self.misses[name]}
+                for name in sorted(set(self.hits) | set(self.misses))
+            }
+
+_cache: Optional[ToolCache] = None
+_cache_lock = threading.Lock()
+
+def get_tool_cache() -> Optional[ToolCache]:
+    """Returns the process-wide tool cache, or None when AGENT_TOOL_CACHE is off."""
+    global _cache
+    if not cache_enabled:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ToolCache()
+        return _cache
+
+def cached_call(name: str, func: Callable, *args, **kwargs) -> Any:
+    cache = get_tool_cache()
+    if cache is None:
+        return func(*args, **kwargs)
+    return cache.call(name, func, *args, **kwargs)
+
+def log_cache_stats() -> None:
+    cache = get_tool_cache()
+    if cache is None:
+        return
+    for name, stats in cache.stats().items():
+        logging.info(f"[CACHE] {name}: {stats}")
@@ -0,0 +1,108 @@
+import os
+import time
+import logging
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from .agent_state import AgentState
+from .logging_setup import log_event
+
+default_tool_timeout = float(os.getenv("AGENT_TOOL_TIMEOUT", "60"))
+max_tool_workers = int(os.getenv("AGENT_TOOL_WORKERS", "8"))
+
+# The question being answered, visible to tools that tailor their output to it.
+current_question: contextvars.ContextVar[str | None] = contextvars.ContextVar("current_question", default=None)
+
+def tool_timeout(name: str) -> float:
+    """Seconds a tool may run, overridable per tool with AGENT_TOOL_TIMEOUT_<NAME>."""
+    return float(os.getenv(f"AGENT_TOOL_TIMEOUT_{name.upper()}", default_tool_timeout))
+
+class ParallelToolNode:
+    """Runs every tool call of the last AIMessage concurrently.
+
+    Each step gets its own pool of at most `max_workers` threads, so a straggler
+    abandoned by one question never holds a worker another question is waiting
+    for. Each call's timeout counts from when it starts running; calls that
+    overrun are abandoned (or cancelled if they never got a worker) and answered
+    with an error ToolMessage, so a step costs as long as its slowest tool instead
+    of the sum. ToolMessages come back in call order.
+    """
+
+    def __init__(self, tools: List[Any], max_workers: int = max_tool_workers):
+        self.tools_by_name: Dict[str, Any] = {tool.name: tool for tool in tools}
+        self.max_workers = max_workers
+
+    def _run(self, tool_call: dict, config: RunnableConfig) -> ToolMessage:
+        tool = self.tools_by_name.get(tool_call["name"])
+        if tool is None:
+            return ToolMessage(
+                content=f"Error: {tool_call['name']} is not a valid tool, try one of [{', '.join(self.tools_by_name)}].",
+                name=tool_call["name"], tool_call_id=tool_call["id"], status="error",
+            )
+        try:
+            result = tool.invoke({**tool_call, "type": "tool_call"}, config)
+        except Exception as e:
+            return ToolMessage(
+                content=f"Error: {e!r}\n Please fix your mistakes.",
+                name=tool_call["name"], tool_call_id=tool_call["id"], status="error",
+            )
+        if isinstance(result, ToolMessage):
+            return result
+        return ToolMessage(content=str(result), name=tool_call["name"], tool_call_id=tool_call["id"])
+
+    @staticmethod
+    def _wait(future: Future, started: Dict[int, float], i: int, timeout: float) -> ToolMessage:
+        """The call's result, allowing `timeout` seconds from when it started running.
+
+        A call still queued behind its siblings waits up to `timeout` for a worker as well.
+        """
+        queued_until = time.monotonic() + timeout
+        while i not in started:
+            try:
+                return future.result(timeout=min(0.05, max(0.0, queued_until - time.monotonic())))
+            except FutureTimeoutError:
+                if i not in started and time.monotonic() >= queued_until:
+                    raise
+        return future.result(timeout=max(0.0, started[i] + timeout - time.monotonic()))
+
+    def __call__(self, state: AgentState, config: RunnableConfig) -> dict:
+        message = state["messages"][-1]
+        tool_calls = message.tool_calls if isinstance(message, AIMessage) else []
+        current_question.set(state.get("question"))
+        if not tool_calls:
+            return {"messages": []}
+        start = time.monotonic()
+        started: Dict[int, float] = {}
+
+        def run(i: int, tool_call: dict) -> ToolMessage:
+            started[i] = time.monotonic()
+            return self._run(tool_call, config)
+
+        executor = ThreadPoolExecutor(max_workers=min(len(tool_calls), self.max_workers), thread_name_prefix="tool")
+        futures: List[Future] = [
+            # Each call runs in a copy of the caller's context so callbacks and tracing stay attached.
+            executor.submit(contextvars.copy_context().run, run, i, tool_call)
+            for i, tool_call in enumerate(tool_calls)
+        ]
+        results = []
+        try:
+            for i, (tool_call, future) in enumerate(zip(tool_calls, futures)):
+                timeout = tool_timeout(tool_call["name"])
+                try:
+                    results.append(self._wait(future, started, i, timeout))
+                except FutureTimeoutError:
+                    future.cancel()
+                    log_event("tool_timeout", level=logging.WARNING, tool=tool_call["name"], timeout_s=timeout,
+                              started=i in started)
+                    results.append(ToolMessage(
+                        content=f"Error: {tool_call['name']} did not finish within {timeout:.0f}s. Try a different query or tool.",
+                        name=tool_call["name"], tool_call_id=tool_call["id"], status="error",
+                    ))
+        finally:
+            # Does not wait: abandoned stragglers finish on their own threads, bounded by their request timeouts.
+            executor.shutdown(wait=False, cancel_futures=True)
+        if len(tool_calls) > 1:
+            logging.debug(f"Ran {len(tool_calls)} tool calls in parallel in {time.monotonic() - start:.2f}s")
+        return {"messages": results}
@@ -1,83 +1,184 @@
 import os
+import time
 import logging
+import functools
 from typing import Any, List
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.runnables import Runnable
-from langchain_community.tools import DuckDuckGoSearchRun
-from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_community.agent_toolkits.load_tools import load_tools
-from langchain_community.tools.youtube.search import YouTubeSearchTool
-
-class LoggingDuckDuckGoSearchRun(DuckDuckGoSearchRun):
-    def __call__(self, *args, **kwargs):
-        logging.info(f"[TOOL] duckduckgo_search called with args={args}, kwargs={kwargs}")
-        result = super().__call__(*args, **kwargs)
-        logging.info(f"[TOOL] duckduckgo_search result: {result}")
-        return result
-
-class LoggingTavilySearchResults(TavilySearchResults):
-    def __call__(self, *args, **kwargs):
-        logging.info(f"[TOOL] tavily_search called with args={args}, kwargs={kwargs}")
-        result = super().__call__(*args, **kwargs)
-        logging.info(f"[TOOL] tavily_search result: {result}")
-        return result
-
-class LoggingYouTubeSearchTool(YouTubeSearchTool):
-    def __call__(self, *args, **kwargs):
-        logging.info(f"[TOOL] youtube_search called with args={args}, kwargs={kwargs}")
-        result = super().__call__(*args, **kwargs)
-        logging.info(f"[TOOL] youtube_search result: {result}")
-        return result
-
-duckduckgo_search = LoggingDuckDuckGoSearchRun()
-tavily_search = LoggingTavilySearchResults(api_key=os.getenv("TAVILY_API_KEY"))
-youtube_search = LoggingYouTubeSearchTool()
-
-def log_tool_wrapper(tool, name=None):
+from . import rate_limiter, cassette, tool_cache, llm_cache, model_router, metrics, http_client
+from .logging_setup import log_event
+from .registry import registry
+
+def call_tool(name, func, *args, provider=None, **kwargs):
+    """Runs a tool function through the result cache and its upstream's rate limiter, logging input and output as events."""
+    log_event("tool_call", tool=name, args=args, kwargs=kwargs)
+
+    def fetch(*args, **kwargs):
+        # Only calls that miss the cache reach the upstream, so only they spend its quota.
+        rate_limiter.acquire(provider)
+        return func(*args, **kwargs)
+
+    start = time.monotonic()
+    try:
+        # The cache sits inside the cassette: recordings still capture cached results, and replay never touches it.
+        result = cassette.tool_call(name, functools.partial(tool_cache.cached_call, name, fetch), *args, **kwargs)
+    except Exception as e:
+        duration = time.monotonic() - start
+        metrics.observe_tool(name, duration, ok=False)
+        log_event("tool_error", level=logging.WARNING, tool=name, duration_ms=round(1000 * duration, 1), error=str(e))
+        raise
+    duration = time.monotonic() - start
+    metrics.observe_tool(name, duration)
+    text = result if isinstance(result, str) else repr(result)
+    log_event("tool_result", tool=name, duration_ms=round(1000 * duration, 1), result_chars=len(text), result=text)
+    return result
+
+def log_tool_wrapper(tool, name=None, provider=None):
     def wrapper(*args, **kwargs):
-        logging.info(f"[TOOL] {name or getattr(tool, 'name', repr(tool))} called with args={args}, kwargs={kwargs}")
-        result = tool(*args, **kwargs)
-        logging.info(f"[TOOL] {name or getattr(tool, 'name', repr(tool))} result: {result}")
-        return result
+        return call_tool(name or getattr(tool, 'name', repr(tool)), tool, *args, provider=provider, **kwargs)
     wrapper.__name__ = getattr(tool, '__name__', name or repr(tool))
     wrapper.__doc__ = getattr(tool, '__doc__', None) or f"Tool wrapper for {name or repr(tool)}."
     return wrapper
 
-def log_tool_func_wrapper(tool, name=None):
-    """Wraps a tool's func to add logging, preserving signature and docstring."""
-    import functools
+def log_tool_func_wrapper(tool, name=None, provider=None):
+    """Wraps a tool's func (or _run for BaseTool subclasses) to add logging, rate limiting and recording."""
     func = getattr(tool, 'func', None)
     if func is None:
-        return tool  # Not a Tool instance or no func, skip
+        run = getattr(tool, '_run', None)
+        if run is None:
+            return tool  # Not a tool we know how to wrap, skip
+        @functools.wraps(run)
+        def run_wrapper(*args, run_manager=None, **kwargs):
+            return call_tool(name or getattr(tool, 'name', repr(tool)), functools.partial(run, run_manager=run_manager), *args, provider=provider, **kwargs)
+        # BaseTool is a pydantic model, so bypass its field validation to shadow the bound method.
+        object.__setattr__(tool, '_run', run_wrapper)
+        return tool
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        logging.info(f"[TOOL] {name or getattr(tool, 'name', repr(tool))} called with args={args}, kwargs={kwargs}")
-        result = func(*args, **kwargs)
-        logging.info(f"[TOOL] {name or getattr(tool, 'name', repr(tool))} result: {result}")
-        return result
+        return call_tool(name or getattr(tool, 'name', repr(tool)), func, *args, provider=provider, **kwargs)
     tool.func = wrapper
     return tool
 
-wikipedia_search = [log_tool_func_wrapper(t, name=getattr(t, 'name', 'wikipedia_search')) for t in load_tools(["wikipedia"])]
-serpapi_search = [log_tool_func_wrapper(t, name=getattr(t, 'name', 'serpapi_search')) for t in load_tools(["serpapi"])]
-requests_get = [log_tool_func_wrapper(t, name=getattr(t, 'name', 'requests_get')) for t in load_tools(["requests_all"], allow_dangerous_tools=True)]
+def load_wrapped_tools(tool_names: List[str], name: str, provider=None, **kwargs) -> List[Any]:
+    from langchain_community.agent_toolkits.load_tools import load_tools
+    return [log_tool_func_wrapper(t, name=getattr(t, 'name', name), provider=provider) for t in load_tools(tool_names, **kwargs)]
+
+def replay_key(env_var: str) -> str | None:
+    """An API key from the environment, or a placeholder in replay mode, where the cassette answers every call."""
+    key = os.getenv(env_var)
+    if not key and cassette.cassette_mode == "replay":
+        return "replay"
+    return key
+
+def build_duckduckgo_search():
+    from .search_tools import LoggingDuckDuckGoSearchRun
+    return LoggingDuckDuckGoSearchRun()
+
+def build_tavily_search():
+    from .search_tools import LoggingTavilySearchResults, PooledTavilySearchAPIWrapper
+    # The wrapper, not the tool, holds the key; left to its default it only reads the environment.
+    return LoggingTavilySearchResults(api_wrapper=PooledTavilySearchAPIWrapper(tavily_api_key=replay_key("TAVILY_API_KEY")))
+
+def build_youtube_search():
+    from .search_tools import LoggingYouTubeSearchTool
+    return LoggingYouTubeSearchTool()
+
+def build_attachment_reader():
+    from langchain.tools import Tool
+    from .attachments import read_attachment
+    return Tool(
+        name="read_attachment",
+        func=log_tool_wrapper(read_attachment, name="read_attachment"),
+        description="Reads the file attached to the question, given its local path: text, CSV and Excel files."
+    )
 
-tools: List[Any] = [
-    duckduckgo_search,
-    tavily_search,
-    youtube_search
-] + wikipedia_search + serpapi_search + requests_get
+def fetch_page(tool, url: str, run_manager=None) -> str:
+    """requests_get's fetch: the page's main text, raising for error statuses so they are never cached.
 
-try:
-    gemini_api_key = os.getenv("GEMINI_API_KEY")
-    if not gemini_api_key:
-        raise ValueError("GEMINI_API_KEY environment variable not set.")
+    Goes through the pooled session, whose connect and read timeouts bound how long a tool worker can hang.
+    """
+    from langchain_community.tools.requests.tool import _clean_url
+    from .page_extract import extract_main_text
+    response = http_client.get(_clean_url(url), headers=tool.requests_wrapper.headers)
+    response.raise_for_status()
+    return extract_main_text(response.text)
+
+def build_requests_tools() -> List[Any]:
+    """The requests_all toolkit, with requests_get reduced to the page passages relevant to the question.
+
+    Markup is stripped before the cache and logging wrapper, so the cache stores main text once
+    per URL; ranking runs outside it because it depends on the current question.
+    """
+    from langchain_community.agent_toolkits.load_tools import load_tools
+    from .page_extract import relevant_page_text
+    tools = []
+    for tool in load_tools(["requests_all"], allow_dangerous_tools=True):
+        if tool.name == "requests_get":
+            object.__setattr__(tool, '_run', functools.wraps(tool._run)(functools.partial(fetch_page, tool)))
+            tool = log_tool_func_wrapper(tool, name=tool.name)
+            logged_run = tool._run
+            object.__setattr__(tool, '_run', functools.wraps(logged_run)(lambda *args, **kwargs: relevant_page_text(logged_run(*args, **kwargs))))
+            tools.append(tool)
+        else:
+            tools.append(log_tool_func_wrapper(tool, name=tool.name))
+    return tools
+
+def build_tools() -> List[Any]:
+    return [
+        registry.get("duckduckgo_search"),
+        registry.get("tavily_search"),
+        registry.get("youtube_search"),
+        registry.get("read_attachment"),
+    ] + registry.get("wikipedia_search") + registry.get("serpapi_search") + registry.get("requests_get")
+
+def build_chat_model(model_name: str, api_key: str) -> Runnable:
+    """One Gemini model bound to the tools, behind the response cache and its rate limiter."""
+    from langchain_google_genai import ChatGoogleGenerativeAI
     llm = ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash",
-        google_api_key=gemini_api_key
+        model=model_name,
+        google_api_key=api_key,
+        max_retries=1  # Quota backoff is handled by rate_limiter.ModelRateLimiter.
     )
-    llm_with_tools = llm.bind_tools(tools)
-    agent_runnable: Runnable = llm_with_tools
-except Exception as e:
-    logging.error(f"Error initializing Gemini model or binding tools: {e}")
-    raise RuntimeError(f"Failed to create Gemini agent runnable: {e}") from e
+    llm_with_tools = llm.bind_tools(registry.get("tools"))
+    # The cache sits in front of the limiter, so hits do not spend quota.
+    limited = rate_limiter.RateLimitedRunnable(llm_with_tools, provider=model_router.limiter_provider(model_name))
+    return llm_cache.CachedRunnable(limited, name=model_name, tool_schemas=llm_with_tools.kwargs.get("tools"))
+
+def build_agent_runnable() -> Runnable:
+    try:
+        gemini_api_key = replay_key("GEMINI_API_KEY")
+        if not gemini_api_key:
+            raise ValueError("GEMINI_API_KEY environment variable not set.")
+        router = model_router.ModelCascade(
+            cheap=build_chat_model(model_router.cheap_model_name, gemini_api_key),
+            strong=build_chat_model(model_router.strong_model_name, gemini_api_key),
+        )
+        # Cassette outermost, so replays never touch the router, the cache or the rate limiters.
+        return cassette.CassetteRunnable(router, name=model_router.strong_model_name)
+    except Exception as e:
+        logging.error(f"Error initializing Gemini model or binding tools: {e}")
+        raise RuntimeError(f"Failed to create Gemini agent runnable: {e}") from e
+
+registry.register("duckduckgo_search", build_duckduckgo_search)
+registry.register("tavily_search", build_tavily_search)
+registry.register("youtube_search", build_youtube_search)
+registry.register("wikipedia_search", lambda: load_wrapped_tools(["wikipedia"], "wikipedia_search"))
+registry.register("serpapi_search", lambda: load_wrapped_tools(
+    ["serpapi"], "serpapi_search", provider="serpapi", serpapi_api_key=replay_key("SERPAPI_API_KEY")
+))
+registry.register("requests_get", build_requests_tools)
+registry.register("read_attachment", build_attachment_reader)
+registry.register("tools", build_tools)
+registry.register("agent_runnable", build_agent_runnable)
+
+def get_tools() -> List[Any]:
+    return registry.get("tools")
+
+def get_agent_runnable() -> Runnable:
+    return registry.get("agent_runnable")
+
+def __getattr__(name: str) -> Any:
+    # Keeps `from .utils import tools` style imports working while building on first access.
+    try:
+        return registry.get(name)
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
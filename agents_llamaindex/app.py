@@ -25,9 +25,10 @@ def initialize_agent():
         logger.error("FATAL: GEMINI_API_KEY environment variable not set!")
         exit("API Key not configured. Please set the GEMINI_API_KEY environment variable.")
     
-    logger.info("Initializing Gemini model...")
+    model_name = os.getenv("LLAMAINDEX_GEMINI_MODEL", "models/gemini-2.0-flash")
+    logger.info(f"Initializing Gemini model {model_name}...")
     llm = GoogleGenAI(
-        model_name="models/gemini-1.5-flash",
+        model_name=model_name,
         api_key=GEMINI_API_KEY
     )
     
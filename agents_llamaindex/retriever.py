@@ -1,18 +1,17 @@
+from typing import List
 from llama_index.core.tools import FunctionTool
-from llama_index.retrievers.bm25 import BM25Retriever
-from .prepare_dataset import load_and_prepare_docs
+from agents_langgraph.guest_search import search_guests, search_guests_many
 
 
-docs = load_and_prepare_docs()
-bm25_retriever = BM25Retriever.from_defaults(nodes=docs)
-
 def get_guest_info_retriever(query: str) -> str:
     """Retrieves detailed information about gala guests based on their name or relation."""
-    results = bm25_retriever.retrieve(query)
-    if results:
-        return "\n\n".join([doc.text for doc in results[:3]])
-    else:
-        return "No matching guest information found."
+    return search_guests(query, k=3)
 
 # Initialize the tool
-guest_info_retriever = FunctionTool.from_defaults(fn=get_guest_info_retriever, name="guest_info_retriever", description="Retrieve detailed information about gala guests based on their name or relation.")
\ No newline at end of file
+guest_info_retriever = FunctionTool.from_defaults(fn=get_guest_info_retriever, name="guest_info_retriever", description="Retrieve detailed information about gala guests based on their name or relation.")
+
+def get_guests_info_retriever(queries: List[str]) -> str:
+    """Retrieves detailed information about several gala guests at once, one section per name or relation."""
+    return search_guests_many(queries, k=3)
+
+guests_info_retriever = FunctionTool.from_defaults(fn=get_guests_info_retriever, name="guests_info_retriever", description="Retrieve detailed information about several gala guests at once, given a list of names or relations.")
\ No newline at end of file
@@ -2,10 +2,11 @@ from llama_index.tools.duckduckgo import DuckDuckGoSearchToolSpec
 from llama_index.core.tools import FunctionTool
 import os
 import requests
+from agents_langgraph.http_client import get_session
 from dataclasses import dataclass
 from typing import Dict, Any
 import logging 
-from .retriever import guest_info_retriever
+from .retriever import guest_info_retriever, guests_info_retriever
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -88,7 +89,7 @@ def get_weather_info(location: str) -> str:
     }
 
     try:
-        response = requests.get(base_url, params=params)
+        response = get_session().get(base_url, params=params)
         response.raise_for_status() # Raises HTTPError for bad responses (4xx or 5xx)
         data = response.json()
 
@@ -135,4 +136,4 @@ except Exception as e:
     logger.error(f"Error initializing Weather Info Tool: {e}", exc_info=True)
     weather_tool = None # Indicate failure
 
-tools = [tool for tool in [search_tool, weather_tool, guest_info_retriever] if tool is not None]
+tools = [tool for tool in [search_tool, weather_tool, guest_info_retriever, guests_info_retriever] if tool is not None]
@@ -6,7 +6,7 @@ from dotenv import load_dotenv
 
 # Import custom tools and utilities
 from .tools import WeatherInfoTool, HubStatsTool
-from .retriever import load_guest_dataset
+from .retriever import GuestInfoBatchRetrieverTool, load_guest_dataset
 from .tracing import (
     initialize_otel_tracing,
     traced_handler,
@@ -36,6 +36,7 @@ def initialize_tools() -> List[Tool]:
     logger.info("Initializing tools...")
     return [
         load_guest_dataset(),  # Guest info retriever
+        GuestInfoBatchRetrieverTool(),  # Several guests in one call
         WeatherInfoTool(),     # Weather information
         HubStatsTool(),        # Hugging Face Hub stats
         DuckDuckGoSearchTool() # Web search
@@ -1,10 +1,6 @@
 from typing import List, Optional
 from smolagents import Tool
-from langchain_community.retrievers import BM25Retriever
-# Import the function from prepare_dataset using relative import
-from .prepare_dataset import load_and_prepare_docs
-# Import Document if needed for type hinting (optional but good practice)
-from langchain.docstore.document import Document
+from agents_langgraph.guest_search import GuestSearchEngine, get_guest_search, format_batch, format_hits
 
 class GuestInfoRetrieverTool(Tool):
     name = "guest_info_retriever"
@@ -17,22 +13,20 @@ class GuestInfoRetrieverTool(Tool):
     }
     output_type = "string"
 
-    def __init__(self, docs: List[Document]) -> None:
+    def __init__(self, engine: Optional[GuestSearchEngine] = None) -> None:
         """
-        Initialize the retriever with a list of documents.
+        Initialize the retriever over the shared guest search engine.
         
         Args:
-            docs: List of Document objects containing guest information
+            engine: Guest search engine to query; defaults to the one over the on-disk index
             
         Raises:
-            ValueError: If docs is empty
+            ValueError: If the index holds no guests
         """
-        if not docs:
-            raise ValueError("Cannot initialize retriever with empty documents list.")
-        
-        print(f"Initializing BM25Retriever with {len(docs)} documents...")
-        self.retriever = BM25Retriever.from_documents(docs)
-        print("BM25Retriever initialized successfully.")
+        self.engine = engine or get_guest_search()
+        if not len(self.engine):
+            raise ValueError("Cannot initialize retriever with an empty guest index.")
+        print(f"Guest index {self.engine.index.fingerprint} loaded with {len(self.engine)} guests.")
 
     def forward(self, query: str) -> str:
         """
@@ -45,18 +39,55 @@ class GuestInfoRetrieverTool(Tool):
             str: Formatted string containing relevant guest information
         """
         print(f"Retriever received query: '{query}'")
-        results = self.retriever.get_relevant_documents(query)
-        print(f"Retriever found {len(results)} relevant documents.")
+        hits = self.engine.search(query, k=3)
+        print(f"Retriever found {len(hits)} relevant documents.")
         
-        if not results:
-            return "No matching guest information found."
-            
         # Return top 3 results, clearly separated
-        return "\n\n---\n\n".join([doc.page_content for doc in results[:3]])
+        return format_hits(hits, separator="\n\n---\n\n")
+
+class GuestInfoBatchRetrieverTool(Tool):
+    name = "guests_info_retriever"
+    description = (
+        "Retrieves detailed information about several gala guests in one call. "
+        "Prefer it over calling guest_info_retriever in a loop."
+    )
+    inputs = {
+        "queries": {
+            "type": "array",
+            "description": "The names or relations of the guests you want information about."
+        }
+    }
+    output_type = "string"
+
+    def __init__(self, engine: Optional[GuestSearchEngine] = None) -> None:
+        """
+        Initialize the batch retriever over the shared guest search engine.
+        
+        Args:
+            engine: Guest search engine to query; defaults to the one over the on-disk index
+        """
+        self.engine = engine or get_guest_search()
+
+    def forward(self, queries: List[str]) -> str:
+        """
+        Retrieve guest information for every query in one pass.
+        
+        Args:
+            queries: Search queries for guest information
+            
+        Returns:
+            str: One section per query, headed by the query, with its top 3 results
+        """
+        results = self.engine.search_many(queries, k=3)
+        print(f"Batch retriever answered {len(queries)} queries; cache {self.engine.cache_stats()}")
+        return format_batch(queries, results, separator="\n\n---\n\n")
 
 def load_guest_dataset() -> GuestInfoRetrieverTool:
     """
-    Load the guest dataset and initialize the GuestInfoRetrieverTool.
+    Open the persisted guest index and initialize the GuestInfoRetrieverTool.
+    
+    The index is only rebuilt from the dataset when it is missing or the
+    dataset's revision changed (see agents_langgraph.guest_index).
     
     Returns:
         GuestInfoRetrieverTool: Initialized tool with loaded guest data
@@ -64,16 +95,11 @@ def load_guest_dataset() -> GuestInfoRetrieverTool:
     Raises:
         RuntimeError: If dataset loading fails
     """
-    print("Starting guest dataset loading and tool initialization...")
+    print("Starting guest index loading and tool initialization...")
     
     try:
-        # Load and prepare the documents
-        docs = load_and_prepare_docs()
-        if not docs:
-            raise RuntimeError("Failed to load guest dataset - no documents found.")
-            
-        # Initialize the tool with the documents
-        guest_info_tool = GuestInfoRetrieverTool(docs)
+        # Initialize the tool with the stored index
+        guest_info_tool = GuestInfoRetrieverTool()
         print("GuestInfoRetrieverTool is ready.")
         return guest_info_tool
         
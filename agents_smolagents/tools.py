@@ -4,6 +4,7 @@ from huggingface_hub import list_models
 import os
 import requests
 from dataclasses import dataclass
+from agents_langgraph.http_client import get_session
 
 @dataclass
 class WeatherData:
@@ -69,7 +70,7 @@ class WeatherInfoTool(Tool):
         }
 
         try:
-            response = requests.get(self.base_url, params=params)
+            response = get_session().get(self.base_url, params=params)
             response.raise_for_status()
             data = response.json()
 
@@ -1,12 +1,18 @@
 import os
 import base64
 import logging
-from typing import Optional, Callable, Any
+import threading
+from typing import Optional, Callable, Any, List
 from dotenv import load_dotenv
 import functools
 import opentelemetry.trace
 from opentelemetry.trace import get_current_span
 
+try:
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+except ImportError:  # SDK not installed; initialize_otel_tracing reports it and leaves tracing off
+    BatchSpanProcessor = SpanExporter = object
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -14,14 +20,139 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# Exporter settings:
+# TRACE_EXPORTER: "otlp" (default, Langfuse), "file" (local JSONL) or "both".
+# TRACE_SAMPLE_RATE: fraction of traces kept, decided once at the root span (default 1.0).
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "otlp").lower()
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_FILE = os.getenv(
+    "TRACE_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs", "traces.jsonl")
+)
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "2048"))
+TRACE_BATCH_SIZE = int(os.getenv("TRACE_BATCH_SIZE", "256"))
+TRACE_EXPORT_INTERVAL = float(os.getenv("TRACE_EXPORT_INTERVAL", "5"))
+
 # Global variables for tracing state
 _tracer_provider = None
 _tracer = None
+_span_processors: List["CountingBatchSpanProcessor"] = []
 IS_TRACING_ENABLED = False
 
+class JsonlSpanExporter(SpanExporter):
+    """
+    Span exporter that appends each finished span as one JSON line to a local file.
+    
+    Used for offline runs; the file can be inspected directly or replayed to a collector later.
+    """
+
+    def __init__(self, path: str = TRACE_FILE):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, spans) -> Any:
+        lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+class _CountingSpanExporter(SpanExporter):
+    """
+    Exporter wrapper that counts the spans its exporter accepted.
+    """
+
+    def __init__(self, exporter):
+        self.exporter = exporter
+        self.exported_spans = 0
+        self._lock = threading.Lock()
+
+    def export(self, spans) -> Any:
+        result = self.exporter.export(spans)
+        if result == SpanExportResult.SUCCESS:
+            with self._lock:
+                self.exported_spans += len(spans)
+        return result
+
+    def shutdown(self) -> None:
+        self.exporter.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.exporter.force_flush(timeout_millis)
+
+class CountingBatchSpanProcessor(BatchSpanProcessor):
+    """
+    The SDK's BatchSpanProcessor, sized from the TRACE_* settings, that also counts spans.
+    
+    Queueing, batching and the export thread are the SDK's: the agent thread only
+    enqueues, and when the bounded queue is full the SDK drops a span rather than
+    block. `unexported_spans` counts sampled spans that ended but were not exported,
+    i.e. still queued, dropped on a full queue or lost to a failed export; after
+    shutdown all of them were lost.
+    
+    Args:
+        exporter: SpanExporter the batches are sent to
+        max_queue_size: Spans held before new ones are dropped
+        max_batch_size: Spans per export call
+        export_interval: Seconds between exports when the queue holds less than a batch
+    """
+
+    def __init__(self, exporter, max_queue_size: int = TRACE_QUEUE_SIZE,
+                 max_batch_size: int = TRACE_BATCH_SIZE, export_interval: float = TRACE_EXPORT_INTERVAL):
+        self._counter = _CountingSpanExporter(exporter)
+        super().__init__(
+            self._counter,
+            max_queue_size=max_queue_size,
+            max_export_batch_size=min(max_batch_size, max_queue_size),
+            schedule_delay_millis=export_interval * 1000,
+        )
+        self._lock = threading.Lock()
+        self.ended_spans = 0
+
+    def on_end(self, span) -> None:
+        if span.context and span.context.trace_flags.sampled:
+            with self._lock:
+                self.ended_spans += 1
+        super().on_end(span)
+
+    @property
+    def exported_spans(self) -> int:
+        return self._counter.exported_spans
+
+    @property
+    def unexported_spans(self) -> int:
+        return self.ended_spans - self.exported_spans
+
+    def shutdown(self) -> None:
+        super().shutdown()
+        logger.info(f"Trace export stopped: {self.exported_spans} spans exported, {self.unexported_spans} dropped.")
+
+def tracing_stats() -> dict:
+    """
+    Span counts across all processors.
+    
+    Returns:
+        dict: exported_spans, and unexported_spans (queued, dropped or failed; all lost after shutdown)
+    """
+    return {
+        "exported_spans": sum(p.exported_spans for p in _span_processors),
+        "unexported_spans": sum(p.unexported_spans for p in _span_processors),
+    }
+
 def initialize_otel_tracing() -> bool:
     """
-    Initialize OpenTelemetry tracing for smolagents using Langfuse exporter.
+    Initialize OpenTelemetry tracing for smolagents.
+    
+    Spans are exported in batches from a background thread, to Langfuse over OTLP
+    and/or to a local JSONL file depending on TRACE_EXPORTER, and only a
+    TRACE_SAMPLE_RATE fraction of traces is recorded.
     
     Returns:
         bool: True if initialization was successful, False otherwise
@@ -30,36 +161,48 @@ def initialize_otel_tracing() -> bool:
 
     LANGFUSE_PUBLIC_KEY = os.getenv("LANGFUSE_PUBLIC_KEY")
     LANGFUSE_SECRET_KEY = os.getenv("LANGFUSE_SECRET_KEY")
+    use_otlp = TRACE_EXPORTER in ("otlp", "both")
+    use_file = TRACE_EXPORTER in ("file", "both")
 
-    if not LANGFUSE_PUBLIC_KEY or not LANGFUSE_SECRET_KEY:
-        logger.warning("Langfuse API keys not found. OpenTelemetry tracing disabled.")
-        IS_TRACING_ENABLED = False
-        return False
+    if use_otlp and (not LANGFUSE_PUBLIC_KEY or not LANGFUSE_SECRET_KEY):
+        if not use_file:
+            logger.warning("Langfuse API keys not found. OpenTelemetry tracing disabled.")
+            IS_TRACING_ENABLED = False
+            return False
+        logger.warning("Langfuse API keys not found. Exporting traces to the local file only.")
+        use_otlp = False
 
     try:
         # Import necessary OTel components
         from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
         from openinference.instrumentation.smolagents import SmolagentsInstrumentor
-        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
-        from opentelemetry.sdk.trace.export import SimpleSpanProcessor
 
-        logger.info("Configuring Langfuse OpenTelemetry Exporter...")
-        LANGFUSE_AUTH = base64.b64encode(
-            f"{LANGFUSE_PUBLIC_KEY}:{LANGFUSE_SECRET_KEY}".encode()
-        ).decode()
-        
-        otel_endpoint = os.getenv(
-            "LANGFUSE_HOST_OTEL",
-            "https://cloud.langfuse.com/api/public/otel"
-        )
-        
-        os.environ["OTEL_EXPORTER_OTLP_ENDPOINT"] = otel_endpoint
-        os.environ["OTEL_EXPORTER_OTLP_HEADERS"] = f"Authorization=Basic {LANGFUSE_AUTH}"
+        exporters = []
+        if use_otlp:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            logger.info("Configuring Langfuse OpenTelemetry Exporter...")
+            LANGFUSE_AUTH = base64.b64encode(
+                f"{LANGFUSE_PUBLIC_KEY}:{LANGFUSE_SECRET_KEY}".encode()
+            ).decode()
+            
+            otel_endpoint = os.getenv(
+                "LANGFUSE_HOST_OTEL",
+                "https://cloud.langfuse.com/api/public/otel"
+            )
+            
+            os.environ["OTEL_EXPORTER_OTLP_ENDPOINT"] = otel_endpoint
+            os.environ["OTEL_EXPORTER_OTLP_HEADERS"] = f"Authorization=Basic {LANGFUSE_AUTH}"
+            exporters.append(OTLPSpanExporter())
+        if use_file:
+            exporters.append(JsonlSpanExporter(TRACE_FILE))
 
-        # Initialize and configure tracer provider
-        _tracer_provider = TracerProvider()
-        span_processor = SimpleSpanProcessor(OTLPSpanExporter())
-        _tracer_provider.add_span_processor(span_processor)
+        # Initialize and configure tracer provider; sampling is decided once per trace at its root
+        _tracer_provider = TracerProvider(sampler=ParentBased(TraceIdRatioBased(TRACE_SAMPLE_RATE)))
+        for exporter in exporters:
+            span_processor = CountingBatchSpanProcessor(exporter)
+            _span_processors.append(span_processor)
+            _tracer_provider.add_span_processor(span_processor)
 
         # Set global tracer provider
         opentelemetry.trace.set_tracer_provider(_tracer_provider)
@@ -67,7 +210,11 @@ def initialize_otel_tracing() -> bool:
 
         # Instrument smolagents
         SmolagentsInstrumentor().instrument(tracer_provider=_tracer_provider)
-        logger.info(f"SmolagentsInstrumentor initialized successfully. Sending traces to: {otel_endpoint}")
+        destinations = ([otel_endpoint] if use_otlp else []) + ([TRACE_FILE] if use_file else [])
+        logger.info(
+            f"SmolagentsInstrumentor initialized successfully. Sending {TRACE_SAMPLE_RATE:.0%} of traces to: "
+            f"{', '.join(destinations)}"
+        )
         
         IS_TRACING_ENABLED = True
         return True
@@ -1,54 +1,172 @@
 import os
 import time
+import uuid
 import logging
 import requests
 import gradio as gr
 import pandas as pd
-from datetime import datetime
-from agents_langgraph.langfuse_client import langfuse_handler
-from agents_langgraph.agent_core import react_graph
-from langchain_core.messages import AIMessage
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from agents_langgraph import http_client, rate_limiter, tool_cache, llm_cache, checkpointing, metrics
+from agents_langgraph.logging_setup import configure_logging
+from agents_langgraph.langfuse_client import get_langfuse_handler
+from agents_langgraph.agent_core import get_react_graph
+from agents_langgraph.registry import registry
+from agents_langgraph.answer_store import AnswerStore
+from agents_langgraph.attachments import AttachmentPrefetcher
+from agents_langgraph.budget import StepBudget
 
 log_dir = os.path.join(os.path.dirname(__file__), 'logs')
-os.makedirs(log_dir, exist_ok=True)
-log_file = os.path.join(
-    log_dir,
-    f'agent_debug_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
-)
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s %(levelname)s %(message)s',
-    handlers=[
-        logging.FileHandler(log_file, encoding='utf-8', mode='a'),
-        logging.StreamHandler()
-    ]
-)
+log_file = configure_logging(log_dir, level=os.getenv("LOG_LEVEL", "DEBUG"))
 
 default_api_url = "https://agents-course-unit4-scoring.hf.space"
+max_workers = int(os.getenv("AGENT_MAX_WORKERS", "4"))
 
 class BasicAgent:
-    def __init__(self):
-        logging.info("BasicAgent initialized.")
-    def __call__(self, question: str) -> str:
+    def __init__(self, budget: StepBudget | None = None):
+        self.budget = budget or StepBudget.from_env()
+        logging.info(f"BasicAgent initialized with {self.budget}.")
+    def __call__(self, question: str, file_path: str | None = None, task_id: str | None = None) -> str:
+        return self.run(question, file_path=file_path, task_id=task_id)["final_answer"]
+
+    def run(self, question: str, file_path: str | None = None, task_id: str | None = None) -> dict:
+        """Answers a question; returns the final graph state, with final_answer always a string."""
         if not question or not question.strip():
             logging.info("Received empty question, skipping.")
-            return ""
-        messages = []
-        result = react_graph.invoke(
-                input={"messages": messages, "question": question},
-                config={"callbacks": [langfuse_handler]}
-            )
-        messages = result["messages"]
-        while True:
-            result = react_graph.invoke(
-                input={"messages": messages, "question": question},
-                config={"callbacks": [langfuse_handler]}
-            )
-            messages = result["messages"]
-            if isinstance(messages[-1], AIMessage) and getattr(messages[-1], "type", None) == "final":
-                answer = result.get("final_answer", messages[-1].content)
-                logging.info(f"Agent returning answer: {answer}")
-                return answer
+            return {"final_answer": "", "stop_reason": None}
+        langfuse_handler = get_langfuse_handler()
+        graph = get_react_graph()
+        saver = checkpointing.get_checkpointer()
+        thread_id = task_id or uuid.uuid4().hex
+        config = {
+            "callbacks": [langfuse_handler] if langfuse_handler else [],
+            "recursion_limit": self.budget.recursion_limit,
+            "configurable": {"budget": self.budget, "thread_id": thread_id},
+        }
+        graph_input = {"messages": [], "question": question, "file_path": file_path}
+        if saver is not None:
+            snapshot = graph.get_state(config)
+            if snapshot.next:
+                # A previous attempt failed mid-trajectory: continue from its last completed node,
+                # with a fresh time budget for this attempt.
+                logging.info(f"Resuming {thread_id} at {snapshot.next} after {snapshot.values.get('llm_calls')} LLM calls.")
+                graph.update_state(config, {"started_at": time.time()})
+                graph_input = None
+            elif snapshot.values:
+                checkpointing.delete_thread(saver, thread_id)
+        try:
+            result = graph.invoke(input=graph_input, config=config)
+        except Exception:
+            if saver is not None:
+                checkpointing.compact_thread(saver, thread_id)
+            raise
+        # The answer is persisted by the caller, so the trajectory is no longer needed.
+        checkpointing.delete_thread(saver, thread_id)
+        answer = result.get("final_answer") or ""
+        logging.info(
+            f"Agent returning answer after {result.get('llm_calls')} LLM calls and "
+            f"{result.get('tool_calls')} tool calls (models: {result.get('model_calls') or {}}, "
+            f"stop reason: {result.get('stop_reason') or 'final'}): {answer}"
+        )
+        return {**result, "final_answer": answer}
+
+def answer_question(agent: BasicAgent, item: dict, store: AnswerStore,
+                    prefetcher: AttachmentPrefetcher | None = None) -> dict:
+    task_id = item["task_id"]
+    question_text = item["question"]
+    totals = metrics.start_question()
+    start = time.monotonic()
+    stop_reason = None
+    try:
+        file_path = prefetcher.get(task_id) if prefetcher else None
+        result = agent.run(question_text, file_path=file_path, task_id=task_id)
+        answer, stop_reason = result["final_answer"], result.get("stop_reason")
+        # An empty answer is stored but not final, so the next run retries the question.
+        status = "ok" if answer.strip() else "empty"
+        if status == "empty":
+            logging.warning(f"Agent gave an empty answer to question {task_id} (stop reason: {stop_reason or 'final'}); "
+                            f"it will be retried on the next run.")
+    except Exception as e:
+        logging.error(f"Error answering question {task_id}: {e}")
+        answer, status = f"Error: {e}", "error"
+    latency = time.monotonic() - start
+    metrics.observe_question(latency, status)
+    metrics.write_prometheus()
+    logging.info(f"Question {task_id} metrics: {totals.as_dict()}")
+    return store.put(task_id, question_text, answer, status=status, latency=latency, metrics=totals.as_dict(),
+                     stop_reason=stop_reason)
+
+def results_row(record: dict) -> dict:
+    latency = record.get("latency")
+    totals = record.get("metrics") or {}
+    return {
+        "Task ID": record["task_id"],
+        "Question": record["question"],
+        "Submitted Answer": record["answer"],
+        "Latency (s)": round(latency, 1) if latency is not None else None,
+        "LLM (s)": totals.get("llm_seconds"),
+        "Tools (s)": totals.get("tool_seconds"),
+        "Throttled (s)": totals.get("sleep_seconds"),
+        "Tokens": totals.get("input_tokens", 0) + totals.get("output_tokens", 0) if totals else None,
+        "Cache hits": totals.get("cache_hits"),
+    }
+
+def time_breakdown(records: list) -> str:
+    """Where this run's time went, summed over questions; tool time overlaps when calls run in parallel."""
+    totals = [record.get("metrics") or {} for record in records]
+    llm = sum(t.get("llm_seconds", 0.0) for t in totals)
+    tools = sum(t.get("tool_seconds", 0.0) for t in totals)
+    sleep = sum(t.get("sleep_seconds", 0.0) for t in totals)
+    hits = sum(t.get("cache_hits", 0) for t in totals)
+    lookups = hits + sum(t.get("cache_misses", 0) for t in totals)
+    hit_rate = f"{100 * hits / lookups:.0f}%" if lookups else "n/a"
+    return f"Time in LLM: {llm:.0f}s, tools: {tools:.0f}s, throttling: {sleep:.0f}s; cache hit rate: {hit_rate}"
+
+def progress_status(done: int, total: int, errors: int, skipped: int, started: float, latencies: list,
+                    records: list = ()) -> str:
+    elapsed = time.monotonic() - started
+    mean_latency = sum(latencies) / len(latencies) if latencies else 0.0
+    return (
+        f"Answered {done}/{total} questions ({skipped} from previous runs, {errors} errors).\n"
+        f"Elapsed: {elapsed:.0f}s, mean latency: {mean_latency:.1f}s, "
+        f"slowest: {max(latencies, default=0.0):.1f}s\n"
+        f"{time_breakdown(records)}"
+    )
+
+def submit_answers(username: str, agent_code: str, answers_payload: list) -> str:
+    submit_url = f"{default_api_url}/submit"
+    submission_data = {"username": username.strip(), "agent_code": agent_code, "answers": answers_payload}
+    logging.info(f"Submitting {len(answers_payload)} answers to: {submit_url}")
+    try:
+        submit_response = http_client.post(submit_url, json=submission_data, timeout=30)
+        submit_response.raise_for_status()
+        result = submit_response.json()
+        final_status = (
+            f"Submission Successful!\n"
+            f"User: {result.get('username')}\n"
+            f"Overall Score: {result.get('score', 'N/A')}% "
+            f"({result.get('correct_count', '?')}/{result.get('total_attempted', '?')} correct)\n"
+            f"Message: {result.get('message', 'No message received.')}"
+        )
+        logging.info(f"Submission result: {result}")
+        return final_status
+    except requests.exceptions.HTTPError as e:
+        logging.error(f"HTTP error during submission: {e}")
+        status_message = f"Submission Failed: Server responded with status {e.response.status_code}."
+        try:
+            error_json = e.response.json()
+            status_message += f" Detail: {error_json.get('detail', e.response.text)}"
+        except requests.exceptions.JSONDecodeError:
+            status_message += f" Response: {e.response.text[:500]}"
+        return status_message
+    except requests.exceptions.Timeout:
+        logging.error("Submission request timed out.")
+        return "Submission Failed: The request timed out."
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Submission request error: {e}")
+        return f"Submission Failed: Network error - {e}"
+    except Exception as e:
+        logging.error(f"Unexpected error during submission: {e}")
+        return f"An unexpected error occurred during submission: {e}"
 
 def run_and_submit_all(profile: gr.OAuthProfile | None):
     space_id = os.getenv("SPACE_ID")
@@ -57,94 +175,110 @@ def run_and_submit_all(profile: gr.OAuthProfile | None):
         logging.info(f"User logged in: {username}")
     else:
         logging.info("User not logged in.")
-        return "Please Login to Hugging Face with the button.", None
+        yield "Please Login to Hugging Face with the button.", None
+        return
 
     api_url = default_api_url
     questions_url = f"{api_url}/questions"
-    submit_url = f"{api_url}/submit"
 
     try:
         agent = BasicAgent()
     except Exception as e:
         logging.error(f"Error instantiating agent: {e}")
-        return f"Error initializing agent: {e}", None
+        yield f"Error initializing agent: {e}", None
+        return
     agent_code = f"https://huggingface.co/spaces/{space_id}/tree/main"
     logging.info(agent_code)
 
     logging.info(f"Fetching questions from: {questions_url}")
     try:
-        response = requests.get(questions_url, timeout=15)
+        response = http_client.get(questions_url, timeout=15)
         response.raise_for_status()
         questions_data = response.json()
         if not questions_data:
             logging.warning("Fetched questions list is empty.")
-            return "Fetched questions list is empty or invalid format.", None
+            yield "Fetched questions list is empty or invalid format.", None
+            return
         logging.info(f"Fetched {len(questions_data)} questions.")
     except requests.exceptions.RequestException as e:
         logging.error(f"Error fetching questions: {e}")
-        return f"Error fetching questions: {e}", None
+        yield f"Error fetching questions: {e}", None
+        return
     except requests.exceptions.JSONDecodeError as e:
         logging.error(f"Error decoding JSON response from questions endpoint: {e}")
         logging.error(f"Response text: {response.text[:500]}")
-        return f"Error decoding server response for questions: {e}", None
+        yield f"Error decoding server response for questions: {e}", None
+        return
     except Exception as e:
         logging.error(f"An unexpected error occurred fetching questions: {e}")
-        return f"An unexpected error occurred fetching questions: {e}", None
-
-    results_log = []
-    answers_payload = []
-    logging.info(f"Running agent on {len(questions_data)} questions...")
-    for item in questions_data:
-        task_id = item.get("task_id")
-        question_text = item.get("question")
-        if not task_id or question_text is None:
-            continue
-        try:
-            answer = agent(question_text)
-            answers_payload.append({"task_id": task_id, "submitted_answer": answer})
-            results_log.append({"Task ID": task_id, "Question": question_text, "Submitted Answer": answer})
-        except Exception as e:
-            logging.error(f"Error answering question {task_id}: {e}")
-            answers_payload.append({"task_id": task_id, "submitted_answer": f"Error: {e}"})
-            results_log.append({"Task ID": task_id, "Question": question_text, "Submitted Answer": f"Error: {e}"})
-        time.sleep(3)
+        yield f"An unexpected error occurred fetching questions: {e}", None
+        return
 
-    if not answers_payload:
-        return "No answers generated.", pd.DataFrame(results_log)
+    items = [
+        item for item in questions_data
+        if item.get("task_id") and item.get("question") is not None
+    ]
+    store = AnswerStore()
+    pending = [item for item in items if not store.has_answer(item["task_id"], item["question"])]
+    prefetcher = AttachmentPrefetcher(api_url).start(pending)
+    skipped = len(items) - len(pending)
+    logging.info(
+        f"{skipped} questions already answered in {store.path}; "
+        f"running agent on {len(pending)} questions with {max_workers} workers..."
+    )
+    records = {item["task_id"]: store.get(item["task_id"], item["question"]) for item in items}
+    records = {task_id: record for task_id, record in records.items() if record and record["status"] == "ok"}
 
-    submission_data = {"username": username.strip(), "agent_code": agent_code, "answers": answers_payload}
-    logging.info(f"Submitting {len(answers_payload)} answers to: {submit_url}")
+    def table() -> pd.DataFrame:
+        return pd.DataFrame([results_row(records[item["task_id"]]) for item in items if item["task_id"] in records])
+
+    started = time.monotonic()
+    latencies = []
+    run_records = []
+    errors = 0
+    yield progress_status(len(records), len(items), errors, skipped, started, latencies), table()
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
     try:
-        submit_response = requests.post(submit_url, json=submission_data, timeout=30)
-        submit_response.raise_for_status()
-        result = submit_response.json()
-        final_status = (
-            f"Submission Successful!\n"
-            f"User: {result.get('username')}\n"
-            f"Overall Score: {result.get('score', 'N/A')}% "
-            f"({result.get('correct_count', '?')}/{result.get('total_attempted', '?')} correct)\n"
-            f"Message: {result.get('message', 'No message received.')}"
-        )
-        logging.info(f"Submission result: {result}")
-        return final_status, pd.DataFrame(results_log)
-    except requests.exceptions.HTTPError as e:
-        logging.error(f"HTTP error during submission: {e}")
-        status_message = f"Submission Failed: Server responded with status {e.response.status_code}."
-        try:
-            error_json = e.response.json()
-            status_message += f" Detail: {error_json.get('detail', e.response.text)}"
-        except requests.exceptions.JSONDecodeError:
-            status_message += f" Response: {e.response.text[:500]}"
-        return status_message, pd.DataFrame(results_log)
-    except requests.exceptions.Timeout:
-        logging.error("Submission request timed out.")
-        return "Submission Failed: The request timed out.", pd.DataFrame(results_log)
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Submission request error: {e}")
-        return f"Submission Failed: Network error - {e}", pd.DataFrame(results_log)
-    except Exception as e:
-        logging.error(f"Unexpected error during submission: {e}")
-        return f"An unexpected error occurred during submission: {e}", pd.DataFrame(results_log)
+        futures = [executor.submit(answer_question, agent, item, store, prefetcher) for item in pending]
+        for future in as_completed(futures):
+            record = future.result()
+            records[record["task_id"]] = record
+            latencies.append(record["latency"])
+            run_records.append(record)
+            errors += record["status"] == "error"
+            yield progress_status(len(records), len(items), errors, skipped, started, latencies, run_records), table()
+    finally:
+        # Runs on completion and when Gradio closes the generator after a cancel; finished answers are already stored.
+        executor.shutdown(wait=False, cancel_futures=True)
+        prefetcher.shutdown()
+
+    answers_payload = [
+        {"task_id": item["task_id"], "submitted_answer": records[item["task_id"]]["answer"]}
+        for item in items if item["task_id"] in records
+    ]
+    if not answers_payload:
+        yield "No answers generated.", table()
+        return
+    yield progress_status(len(records), len(items), errors, skipped, started, latencies, run_records) + "\nSubmitting answers...", table()
+    yield submit_answers(username, agent_code, answers_payload), table()
+    http_client.log_latency_stats()
+    rate_limiter.log_wait_stats()
+    tool_cache.log_cache_stats()
+    llm_cache.log_cache_stats()
+    logging.info(f"Metrics written to {metrics.write_prometheus()}")
+
+def submit_from_store(profile: gr.OAuthProfile | None):
+    if not profile:
+        logging.info("User not logged in.")
+        return "Please Login to Hugging Face with the button.", None
+    username = f"{profile.username}"
+    agent_code = f"https://huggingface.co/spaces/{os.getenv('SPACE_ID')}/tree/main"
+    records = AnswerStore().answered()
+    if not records:
+        return "No stored answers to submit.", None
+    answers_payload = [{"task_id": r["task_id"], "submitted_answer": r["answer"]} for r in records]
+    return submit_answers(username, agent_code, answers_payload), pd.DataFrame([results_row(r) for r in records])
 
 with gr.Blocks() as demo:
     gr.Markdown("# Basic Agent Evaluation Runner")
@@ -154,18 +288,27 @@ with gr.Blocks() as demo:
         1.  Please clone this space, then modify the code to define your agent's logic, the tools, the necessary packages, etc ...
         2.  Log in to your Hugging Face account using the button below. This uses your HF username for submission.
         3.  Click 'Run Evaluation & Submit All Answers' to fetch questions, run your agent, submit answers, and see the score.
+        4.  Answers are saved as they are produced, so a rerun only retries unanswered or failed questions. 'Submit Stored Answers' resubmits the saved answers without running the agent.
         ---
         Once clicking on the "submit" button, it can take quite some time (this is the time for the agent to go through all the questions).
+        Progress and answers are shown as each question finishes; 'Stop Run' cancels the run and keeps the answers produced so far.
         """
     )
     gr.LoginButton()
     run_button = gr.Button("Run Evaluation & Submit All Answers")
+    resubmit_button = gr.Button("Submit Stored Answers")
     status_output = gr.Textbox(label="Run Status / Submission Result", lines=5, interactive=False)
     results_table = gr.DataFrame(label="Questions and Agent Answers", wrap=True)
-    run_button.click(
+    stop_button = gr.Button("Stop Run")
+    run_event = run_button.click(
         fn=run_and_submit_all,
         outputs=[status_output, results_table]
     )
+    stop_button.click(fn=None, cancels=[run_event])
+    resubmit_button.click(
+        fn=submit_from_store,
+        outputs=[status_output, results_table]
+    )
 
 if __name__ == "__main__":
     logging.info("\n" + "-"*30 + " App Starting " + "-"*30)
@@ -176,5 +319,8 @@ if __name__ == "__main__":
     if space_id_startup:
         logging.info(f"SPACE_ID: {space_id_startup}")
     logging.info("-"*(60 + len(" App Starting ")) + "\n")
+    if os.getenv("AGENT_WARMUP", "1") == "1":
+        logging.info("Warming up tools, model client and graph in the background...")
+        registry.warm_up(["react_graph"])
     logging.info("Launching Gradio Interface for Basic Agent Evaluation...")
     demo.launch(debug=True, share=False)
\ No newline at end of file
@@ -0,0 +1,144 @@
+"""Randomized check that incremental guest updates search like a full rebuild.
+
+Run from the repository root:
+
+    python -m benchmarks.check_guest_updates
+    python -m benchmarks.check_guest_updates --guests 20000 --updates 500 --seed 7
+
+Applies random adds, updates and deletes to a synthetic guest index through
+GuestSearchEngine, then compares its results (names, BM25 scores and match
+types) with an index built from scratch over the same live guests, in the same
+order. The comparison runs on the in-memory delta, after an explicit compaction
+into a new generation, after reopening the index and replaying its update log,
+and after a background compaction followed by another reopen. Exits non-zero
+on any difference.
+"""
+import sys
+import random
+import logging
+import argparse
+import tempfile
+from typing import Dict, List
+from .run_benchmarks import RELATIONS, WORDS, synthetic_guests
+
+class LiveGuests:
+    """The guest list the engine should hold, in document order: updated guests move to the end."""
+
+    def __init__(self, guests: List[dict]):
+        self.guests: Dict[str, dict] = {guest["name"]: guest for guest in guests}
+
+    def names(self) -> List[str]:
+        return list(self.guests)
+
+    def add(self, guest: dict) -> None:
+        self.guests[guest["name"]] = guest
+
+    def update(self, guest: dict) -> None:
+        del self.guests[guest["name"]]
+        self.guests[guest["name"]] = guest
+
+    def delete(self, name: str) -> None:
+        del self.guests[name]
+
+def random_updates(engine, live: LiveGuests, rng: random.Random, count: int) -> None:
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.4:
+            i = rng.randrange(10 ** 7)
+            guest = {
+                "name": f"Newguest{i} {rng.choice(WORDS).title()}son",
+                "relation": rng.choice(RELATIONS),
+                "description": " ".join(rng.choice(WORDS + ["zebra", "quokka"]) for _ in range(12)),
+                "email": f"new{i}@example.org",
+            }
+            if guest["name"] in live.guests:
+                continue
+            engine.add_guest(guest)
+            live.add(guest)
+        elif roll < 0.7:
+            guest = dict(live.guests[rng.choice(live.names())])
+            guest["description"] += f" updated {rng.choice(WORDS)} quokka"
+            engine.update_guest(guest)
+            live.update(guest)
+        else:
+            name = rng.choice(live.names())
+            engine.delete_guest(name)
+            live.delete(name)
+
+def queries(live: LiveGuests, rng: random.Random) -> List[str]:
+    names = live.names()
+    fixed = ["Guest42", "Guest4242 Sailinson", "Guest1", "Newguest", "zebra", "quokka friend",
+             "former classmate", "example org", f"{RELATIONS[0]} {WORDS[0]}", "opera sailing astronomy"]
+    picked = [rng.choice(names) for _ in range(20)]
+    # Last names and misspelled full names exercise the prefix and trigram tiers.
+    picked += [name.split()[-1] for name in picked[:5]] + [name[:-2] + "xx" for name in picked[5:10]]
+    return fixed + picked
+
+def compare(stage: str, engine, live: LiveGuests, rng: random.Random, k: int) -> int:
+    from agents_langgraph import guest_index, guest_search
+    with tempfile.TemporaryDirectory() as root:
+        path = guest_index.build_index(list(live.guests.values()), "reference", root)
+        reference = guest_search.GuestSearchEngine(guest_index.GuestIndex(path), min_score=engine.min_score, cache_entries=0)
+        mismatches = 0
+        if len(engine) != len(reference):
+            print(f"{stage}: {len(engine)} live guests, rebuild has {len(reference)}")
+            mismatches += 1
+        for query in queries(live, rng):
+            got = [(hit.name, round(hit.score, 9), hit.match) for hit in engine.search(query, k)]
+            want = [(hit.name, round(hit.score, 9), hit.match) for hit in reference.search(query, k)]
+            if got != want:
+                mismatches += 1
+                print(f"{stage}: {query!r}\n  incremental: {got}\n  rebuild:     {want}")
+    print(f"{stage:<24} {len(live.guests):>7} guests, {mismatches} mismatches")
+    return mismatches
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--guests", type=int, default=3000)
+    parser.add_argument("--updates", type=int, default=300, help="Random updates per stage.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    from agents_langgraph import guest_index, guest_search
+
+    rng = random.Random(args.seed)
+    live = LiveGuests(synthetic_guests(args.guests))
+    failures = 0
+    with tempfile.TemporaryDirectory() as root:
+        def open_engine(**kwargs):
+            # No score floor, so every matching guest is compared, and no cache, so every query is scored.
+            return guest_search.GuestSearchEngine(guest_index.load_or_build(root, check=False),
+                                                  min_score=0.0, cache_entries=0, **kwargs)
+
+        guest_index.build_index(list(live.guests.values()), "check", root)
+        engine = open_engine(compact_after=0)
+        random_updates(engine, live, rng, args.updates)
+        failures += compare("delta", engine, live, rng, args.k)
+
+        engine.compact()
+        if engine.index.generation != 1:
+            print(f"compaction wrote generation {engine.index.generation}, expected 1")
+            failures += 1
+        failures += compare("compacted", engine, live, rng, args.k)
+
+        random_updates(engine, live, rng, args.updates)
+        engine = open_engine(compact_after=0)
+        failures += compare("reopened", engine, live, rng, args.k)
+
+        engine = open_engine(compact_after=max(1, args.updates // 3))
+        random_updates(engine, live, rng, args.updates)
+        # Wait for the background compactions this stage started.
+        while engine._compactor is not None:
+            engine._compactor.join()
+        if engine.index.generation < 2:
+            print(f"background compaction did not run (generation {engine.index.generation})")
+            failures += 1
+        failures += compare("background compacted", engine, live, rng, args.k)
+        engine = open_engine(compact_after=0)
+        failures += compare("reopened again", engine, live, rng, args.k)
+    print("OK" if not failures else f"FAILED: {failures} mismatches")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""Offline micro-benchmarks for the agent stack.
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks                 # all suites, default sizes
+    python -m benchmarks.run_benchmarks --suite bm25 --bm25-sizes 1000,10000
+    python -m benchmarks.run_benchmarks --suite search --search-sizes 100000,1000000
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/<old>.json
+
+Results are written to benchmarks/results/<git-sha>.json so runs from
+different commits can be compared. Nothing here touches the network: the
+guest dataset is synthetic and the LLM and search tools are stubbed.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import tempfile
+import subprocess
+from contextlib import ExitStack
+from typing import Callable, Dict, List
+from unittest import mock
+
+# Placeholder keys let the tool and model clients be constructed; they are never used.
+for _key in ("GEMINI_API_KEY", "TAVILY_API_KEY", "SERPAPI_API_KEY"):
+    os.environ.setdefault(_key, "benchmark")
+for _provider in ("GEMINI", "TAVILY", "SERPAPI", "DUCKDUCKGO"):
+    os.environ.setdefault(f"RATE_LIMIT_{_provider}_RPM", "1000000000")
+os.environ["AGENT_CASSETTE_MODE"] = "off"
+os.environ["AGENT_TOOL_CACHE"] = "off"
+os.environ["AGENT_LLM_CACHE"] = "bypass"
+os.environ["AGENT_CHECKPOINTS"] = "off"
+
+results_dir = os.path.join(os.path.dirname(__file__), "results")
+RELATIONS = ["friend", "colleague", "cousin", "mentor", "neighbour", "rival", "former classmate"]
+WORDS = (
+    "physics mathematics chess opera sailing astronomy poetry cuisine robotics botany "
+    "painting diplomacy archaeology jazz marathon philanthropy cryptography tennis"
+).split()
+_results: List[dict] = []
+
+def synthetic_guests(n: int, seed: int = 0) -> List[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "name": f"Guest{i} {rng.choice(WORDS).title()}son",
+            "relation": rng.choice(RELATIONS),
+            "description": " ".join(rng.choice(WORDS) for _ in range(20)),
+            "email": f"guest{i}@example.com",
+        }
+        for i in range(n)
+    ]
+
+def measure(name: str, func: Callable[[], object], params: Dict | None = None,
+            repeat: int = 5, number: int = 1) -> dict:
+    """Times `func` `repeat` times (each running it `number` times) and records per-call seconds."""
+    func()  # Warm-up, also surfaces errors before timing.
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    result = {
+        "name": name,
+        "params": params or {},
+        "repeat": repeat,
+        "number": number,
+        "mean": statistics.mean(samples),
+        "min": min(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+    _results.append(result)
+    print(f"{name:<45} {json.dumps(params or {}):<28} mean {result['mean'] * 1e6:12.1f} us  min {result['min'] * 1e6:12.1f} us")
+    return result
+
+def guest_docs(n: int):
+    from agents_langgraph import prepare_dataset
+    with mock.patch.object(prepare_dataset.datasets, "load_dataset", return_value=synthetic_guests(n)):
+        return prepare_dataset.load_and_prepare_docs()
+
+def bench_prepare_docs(sizes: List[int]) -> None:
+    from agents_langgraph import prepare_dataset
+    for n in sizes:
+        guests = synthetic_guests(n)
+        with mock.patch.object(prepare_dataset.datasets, "load_dataset", return_value=guests):
+            measure("load_and_prepare_docs", prepare_dataset.load_and_prepare_docs, {"guests": n}, repeat=3)
+
+def bench_bm25(sizes: List[int]) -> None:
+    queries = ["Guest42", "mentor chess", "opera sailing astronomy", "guest7@example.com"]
+    for n in sizes:
+        docs = guest_docs(n)
+
+        from langchain_community.retrievers import BM25Retriever as LangChainBM25
+        measure("bm25.langgraph.build", lambda: LangChainBM25.from_documents(docs), {"guests": n}, repeat=3)
+        retriever = LangChainBM25.from_documents(docs)
+        measure("bm25.langgraph.query", lambda: [retriever.invoke(q) for q in queries], {"guests": n, "queries": len(queries)})
+
+        from agents_langgraph import guest_index, guest_search
+        guests = synthetic_guests(n)
+        with tempfile.TemporaryDirectory() as root:
+            measure("bm25.guest_index.build", lambda: guest_index.build_index(guests, "bench", root), {"guests": n}, repeat=3)
+            path = guest_index.build_index(guests, "bench", root)
+            measure("bm25.guest_index.open", lambda: guest_index.GuestIndex(path), {"guests": n})
+            engine = guest_search.GuestSearchEngine(guest_index.GuestIndex(path))
+            measure("bm25.guest_search.query", lambda: [engine.search(q) for q in queries], {"guests": n, "queries": len(queries)})
+
+            try:
+                from agents_smolagents.retriever import GuestInfoRetrieverTool
+                with mock.patch("builtins.print"):
+                    tool = GuestInfoRetrieverTool(engine)
+                    measure("bm25.smolagents.query", lambda: [tool.forward(q) for q in queries], {"guests": n, "queries": len(queries)})
+            except ImportError as e:
+                print(f"Skipping smolagents BM25 benchmarks: {e}")
+
+        try:
+            from llama_index.core.schema import Document as LlamaDocument
+            from llama_index.retrievers.bm25 import BM25Retriever as LlamaBM25
+            nodes = [LlamaDocument(text=d.page_content, metadata=d.metadata) for d in docs]
+            measure("bm25.llamaindex.build", lambda: LlamaBM25.from_defaults(nodes=nodes), {"guests": n}, repeat=3)
+            llama_retriever = LlamaBM25.from_defaults(nodes=nodes)
+            measure("bm25.llamaindex.query", lambda: [llama_retriever.retrieve(q) for q in queries], {"guests": n, "queries": len(queries)})
+        except ImportError as e:
+            print(f"Skipping llamaindex BM25 benchmarks: {e}")
+
+def bench_guest_search(sizes: List[int]) -> None:
+    """Per-query latency of the shared guest search engine as the guest list grows."""
+    from agents_langgraph import guest_index, guest_search
+    queries = {
+        "name": "Guest42",
+        "name_typo": "Guest4242 Sailinson",
+        "email": "guest7@example.com",
+        "relation": "former classmate",
+        "broad": "opera sailing astronomy",
+    }
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as root:
+            engine = guest_search.GuestSearchEngine(guest_index.GuestIndex(guest_index.build_index(synthetic_guests(n), "bench", root)))
+            engine.cache_entries = 0  # Measure scoring, not the result cache.
+            for kind, query in queries.items():
+                measure(f"guest_search.{kind}", lambda: engine.search(query), {"guests": n}, repeat=20)
+            # Names as an agent would look them up, plus overlapping topics that fall back to BM25.
+            batch = [f"Guest{i}" for i in range(10)] + [f"{r} {w}" for r in RELATIONS[:3] for w in WORDS[:3]]
+            measure("guest_search.batch_loop", lambda: [engine.search(q) for q in batch], {"guests": n, "queries": len(batch)}, repeat=5)
+            measure("guest_search.batch", lambda: engine.search_many(batch), {"guests": n, "queries": len(batch)}, repeat=5)
+            # Updates applied in place; the queries after them read the merged snapshot.
+            engine.compact_after = 0
+            guest = dict(synthetic_guests(8)[7])
+            measure("guest_search.update", lambda: engine.update_guest(guest), {"guests": n}, repeat=20)
+            measure("guest_search.relation_after_updates", lambda: engine.search(queries["relation"]),
+                    {"guests": n, "updates": len(engine.snapshot.delta)}, repeat=20)
+
+def bench_tool_wrappers() -> None:
+    from langchain.tools import Tool
+    from agents_langgraph.utils import log_tool_wrapper, log_tool_func_wrapper
+
+    def echo(query: str) -> str:
+        return query
+
+    wrapped = log_tool_wrapper(echo, name="echo")
+    func_tool = log_tool_func_wrapper(Tool(name="echo", func=echo, description="echo"), name="echo")
+    measure("tool_wrapper.baseline", lambda: echo("query"), number=10000)
+    measure("tool_wrapper.log_tool_wrapper", lambda: wrapped("query"), number=10000)
+    measure("tool_wrapper.log_tool_func_wrapper", lambda: func_tool.func("query"), number=10000)
+
+def bench_assistant() -> None:
+    from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+    from agents_langgraph import nodes
+    from agents_langgraph.registry import registry
+
+    reply = "I checked the sources.\nFINAL ANSWER: 42"
+    stub = mock.Mock()
+    stub.invoke.side_effect = lambda messages, *args, **kwargs: AIMessage(content=reply)
+    history = [SystemMessage(content="system"), HumanMessage(content="question")]
+    with registry.override("agent_runnable", stub):
+        measure(
+            "assistant.final_answer_extraction",
+            lambda: nodes.assistant({"messages": list(history), "question": "question"}, {}),
+            number=1000,
+        )
+
+def bench_graph(steps_list: List[int]) -> None:
+    from langchain_core.messages import AIMessage
+    from agents_langgraph import utils
+    from agents_langgraph.agent_core import get_react_graph
+    from agents_langgraph.budget import StepBudget
+    from agents_langgraph.registry import registry
+
+    react_graph = get_react_graph()
+
+    for steps in steps_list:
+        def script(messages, *args, **kwargs):
+            calls = sum(1 for m in messages if isinstance(m, AIMessage) and m.tool_calls)
+            if calls < steps:
+                return AIMessage(content="", tool_calls=[{"name": "duckduckgo_search", "args": {"query": "q"}, "id": f"call-{calls}"}])
+            return AIMessage(content="FINAL ANSWER: 42")
+
+        stub = mock.Mock()
+        stub.invoke.side_effect = script
+        budget = StepBudget(max_llm_calls=steps + 2, max_tool_calls=steps + 1)
+        config = {"recursion_limit": budget.recursion_limit, "configurable": {"budget": budget}}
+        with ExitStack() as stack:
+            stack.enter_context(registry.override("agent_runnable", stub))
+            stack.enter_context(mock.patch.object(type(utils.duckduckgo_search.api_wrapper), "run", lambda self, q: "stub result"))
+            measure(
+                "graph.invoke_stub_llm",
+                lambda: react_graph.invoke({"messages": [], "question": "question"}, config),
+                {"tool_steps": steps},
+            )
+
+def bench_import(repeat: int) -> None:
+    """Cold-start cost: a fresh interpreter importing the agent, then building the graph on first use."""
+    def run(code: str) -> None:
+        subprocess.run([sys.executable, "-c", code], check=True, env=os.environ.copy())
+
+    measure("import.interpreter_baseline", lambda: run("pass"), repeat=repeat)
+    measure("import.agent_core", lambda: run("import agents_langgraph.agent_core"), repeat=repeat)
+    measure(
+        "import.agent_core_and_build_graph",
+        lambda: run("from agents_langgraph.agent_core import get_react_graph; get_react_graph()"),
+        repeat=repeat,
+    )
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+def compare(old_path: str, new: List[dict], threshold: float) -> int:
+    with open(old_path, encoding="utf-8") as f:
+        old = {(r["name"], json.dumps(r["params"], sort_keys=True)): r for r in json.load(f)["results"]}
+    regressions = 0
+    print(f"\nComparison against {old_path} (regression threshold {threshold:.0%}):")
+    for result in new:
+        before = old.get((result["name"], json.dumps(result["params"], sort_keys=True)))
+        if not before:
+            continue
+        ratio = result["min"] / before["min"] if before["min"] else float("inf")
+        flag = "REGRESSION" if ratio > 1 + threshold else ""
+        regressions += bool(flag)
+        print(f"{result['name']:<45} {json.dumps(result['params']):<28} {ratio:6.2f}x {flag}")
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suite", action="append", choices=["prepare", "bm25", "search", "wrappers", "assistant", "graph", "import"],
+                        help="Suite to run; repeat for several. Defaults to all.")
+    parser.add_argument("--prepare-sizes", default="10000,100000,1000000")
+    parser.add_argument("--bm25-sizes", default="1000,10000")
+    parser.add_argument("--search-sizes", default="100000,1000000")
+    parser.add_argument("--graph-steps", default="1,5,10")
+    parser.add_argument("--import-repeat", type=int, default=3)
+    parser.add_argument("--output", help="Result file, defaults to benchmarks/results/<git-sha>.json")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    sizes = lambda value: [int(v) for v in value.split(",") if v]
+    suites = args.suite or ["prepare", "bm25", "search", "wrappers", "assistant", "graph", "import"]
+    if "prepare" in suites:
+        bench_prepare_docs(sizes(args.prepare_sizes))
+    if "bm25" in suites:
+        bench_bm25(sizes(args.bm25_sizes))
+    if "search" in suites:
+        bench_guest_search(sizes(args.search_sizes))
+    if "wrappers" in suites:
+        bench_tool_wrappers()
+    if "assistant" in suites:
+        bench_assistant()
+    if "graph" in suites:
+        bench_graph(sizes(args.graph_steps))
+    if "import" in suites:
+        bench_import(args.import_repeat)
+
+    revision = git_revision()
+    output = args.output or os.path.join(results_dir, f"{revision}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "revision": revision,
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": _results,
+        }, f, indent=2)
+    print(f"\nWrote {len(_results)} results to {output}")
+
+    if args.compare:
+        return 1 if compare(args.compare, _results, args.threshold) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())